@@ -0,0 +1,194 @@
+# --- Importações Essenciais ---
+import os
+import uuid
+import streamlit as st
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_experimental.agents import create_pandas_dataframe_agent
+from utils import parse_agent_thoughts
+from gemini_clients import get_client_pool
+from sandbox import SandboxPool, SandboxedPythonTool
+from profiling import make_profile_tool, format_profile_for_prompt
+from sql_engine import DUCKDB_AVAILABLE, make_sql_tool
+from ingestion import get_sample
+
+# Executa o código gerado pelo agente em processos isolados (desative com EDA_SANDBOX_ENABLED=0)
+SANDBOX_ENABLED = os.getenv("EDA_SANDBOX_ENABLED", "1") == "1"
+# Modelo de embeddings usado na busca por perguntas semelhantes no cache de respostas
+EMBEDDING_MODEL = os.getenv("EDA_EMBEDDING_MODEL", "models/gemini-embedding-001")
+# Orientação do prompt para levar as agregações ao motor SQL
+SQL_PROMPT_GUIDELINE = "- **Agregações:** Para contagens, somas, médias, group by, filtros e ordenações, use a ferramenta `sql_query` (tabela `dados`, com todas as linhas do dataset), que é multi-thread e não carrega os dados no pandas. Use Python para gráficos e transformações que o SQL não cobre.\n"
+
+# --- Clientes LLM ---
+def get_llm(model_name):
+    """Retorna o cliente do modelo para a chave de API da sessão, compartilhado pelo pool do processo."""
+    model_name = model_name.replace('models/', '')
+    return get_client_pool().get_llm(st.session_state["api_key"], model_name)
+
+def embed_prompt(text):
+    """Calcula o embedding da pergunta; retorna None se o serviço de embeddings falhar."""
+    try:
+        return get_client_pool().get_embeddings(st.session_state["api_key"], EMBEDDING_MODEL).embed_query(text)
+    except Exception:
+        return None
+
+# --- Execução Isolada ---
+@st.cache_resource
+def get_sandbox_pool():
+    """Pool único de processos de execução, compartilhado por todas as sessões do servidor."""
+    return SandboxPool()
+
+def _sandbox_tools(tools, df, dataset_hash, sample_spec, pool, session_id):
+    """Troca a ferramenta Python do agente por uma que executa o código no pool de processos."""
+    return [
+        SandboxedPythonTool(
+            description=tool.description,
+            pool=pool,
+            session_id=session_id,
+            dataset_hash=dataset_hash,
+            df=df,
+            sample_spec=sample_spec
+        ) if tool.name == "python_repl_ast" else tool
+        for tool in tools
+    ]
+
+# --- Criação do Agente ---
+def create_agent(llm, df, dataset_hash, profile, sample_spec=None, sandbox_pool=None, session_id=None):
+    """Cria o agente de EDA com as ferramentas de perfil e SQL; com sandbox_pool, o código roda nos processos do pool."""
+    extra_tools = [make_profile_tool(profile)]
+    if DUCKDB_AVAILABLE:
+        # SQL sobre o dataset completo (mesmo no modo amostragem), fora do pandas e em paralelo
+        extra_tools.append(make_sql_tool(dataset_hash, df))
+    # No modo amostragem o agente explora a amostra como `df`
+    agent_df = get_sample(dataset_hash, sample_spec, df).copy(deep=False) if sample_spec else df
+    agent = create_pandas_dataframe_agent(
+        llm,
+        agent_df,
+        agent_type="zero-shot-react-description",
+        verbose=False,
+        allow_dangerous_code=True,
+        handle_parsing_errors=True,
+        extra_tools=extra_tools
+    )
+    if sandbox_pool is not None:
+        agent.tools = _sandbox_tools(agent.tools, df, dataset_hash, sample_spec, sandbox_pool, session_id)
+    elif sample_spec:
+        # O dataset completo continua disponível como `df_full` para o cálculo final
+        for tool in agent.tools:
+            if tool.name == "python_repl_ast":
+                tool.locals["df_full"] = df
+    return agent
+
+def sampling_prompt(sample_rows, total_rows):
+    """Instruções adicionais do modo amostragem."""
+    return f"""
+**Modo Amostragem:** `df` é uma amostra de {sample_rows} das {total_rows} linhas do dataset. Use `df` para explorar os dados e gerar gráficos. Para os números finais da resposta (totais, contagens, médias exatas), calcule sobre `df_full`, que contém todas as linhas, e informe quando um resultado vier apenas da amostra.
+"""
+
+def build_system_prompt(profile):
+    """Instruções do agente de EDA, com o perfil pré-calculado do dataset."""
+    return f"""
+Você é um assistente de IA especialista em Análise Exploratória de Dados (EDA). Sua missão é ser um parceiro analítico para o usuário.
+
+**FORMATO DE SAÍDA OBRIGATÓRIO:**
+Sua resposta DEVE SEMPRE começar com "Thought:" e terminar com o bloco "Final Answer:". Toda a sua resposta final para o usuário deve estar contida nele. NUNCA dê a resposta final sem o prefixo "Final Answer:".
+
+**Sua Diretriz Principal: Adapte-se ao usuário.**
+
+1.  **Para Saudações Simples (oi, olá, etc.):** Se o usuário apenas cumprimentar, responda de forma breve e amigável (ex: "Olá! Como posso ajudar com seus dados hoje?") e aguarde o comando dele. Não inicie uma análise completa.
+
+2.  **Para Pedidos de Análise:** Quando o usuário pedir uma análise, siga a estrutura abaixo:
+    a. **Primeiro, atenda:** Entregue o resultado direto (texto ou gráfico) que foi solicitado.
+    b. **Depois, guie:** Após entregar o resultado, agregue valor:
+        - **Explique:** Diga o que o resultado significa.
+        - **Observe:** Compartilhe qualquer insight proativo que você encontrou.
+        - **Sugira:** Recomende um próximo passo lógico para a análise.
+        - **Engaje:** Termine com uma pergunta para manter a conversa fluindo.
+
+**Outras Diretrizes Importantes:**
+- **Idioma:** Responda sempre no idioma da pergunta do usuário.
+- **Melhores Práticas:** Crie gráficos com títulos e rótulos claros.
+- **Gráficos:** Use `matplotlib` ou `seaborn`. **CRÍTICO: Salve sempre o gráfico em `plot.png`**. Não use `plt.show()`.
+- **Perfil do Dataset:** Para perguntas descritivas (tipos, estatísticas, valores ausentes, cardinalidade, correlações), responda a partir do perfil abaixo ou da ferramenta `dataset_profile` antes de executar código.
+{SQL_PROMPT_GUIDELINE if DUCKDB_AVAILABLE else ""}
+**Perfil do Dataset (pré-calculado):**
+{format_profile_for_prompt(profile)}
+"""
+
+# --- Cache de Agentes ---
+def get_agent(df, dataset_hash, model_name, profile, sample_spec=None):
+    """Retorna o agente da sessão para (dataset, modelo, amostra), reconstruindo-o apenas quando algum deles muda."""
+    agent_cache = st.session_state.setdefault("agent_cache", {})
+    cache_key = (dataset_hash, model_name, sample_spec)
+    if cache_key not in agent_cache:
+        # Um novo arquivo, modelo ou configuração de amostra invalida o agente anterior da sessão
+        agent_cache.clear()
+        sandbox_pool = session_id = None
+        if SANDBOX_ENABLED:
+            sandbox_pool = get_sandbox_pool()
+            session_id = st.session_state.setdefault("session_id", uuid.uuid4().hex)
+        agent_cache[cache_key] = create_agent(
+            get_llm(model_name), df, dataset_hash, profile, sample_spec, sandbox_pool=sandbox_pool, session_id=session_id
+        )
+    return agent_cache[cache_key]
+
+# --- Captura do Raciocínio ---
+class AgentTraceHandler(BaseCallbackHandler):
+    """Registra os passos Thought/Action/Action Input/Observation durante a execução do agente."""
+
+    def __init__(self):
+        self.steps = []
+
+    def on_agent_action(self, action, **kwargs):
+        self.steps.extend(parse_agent_thoughts(action.log))
+        self.steps.append({"type": "Action", "content": action.tool})
+        self.steps.append({"type": "Action Input", "content": str(action.tool_input).strip()})
+
+    def on_tool_end(self, output, **kwargs):
+        self.steps.append({"type": "Observation", "content": str(output).strip()})
+
+    def on_agent_finish(self, finish, **kwargs):
+        self.steps.extend(parse_agent_thoughts(finish.log))
+
+class StreamingResponseHandler(BaseCallbackHandler):
+    """Exibe no chat, conforme chegam, os tokens do LLM e cada passo executado pelo agente."""
+
+    def __init__(self, status, placeholder):
+        self.status = status
+        self.placeholder = placeholder
+        self.buffer = ""
+        self.step_count = 0
+
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        self.buffer = ""
+
+    def on_llm_new_token(self, token, **kwargs):
+        self.buffer += token
+        if "Final Answer:" in self.buffer:
+            self.placeholder.markdown(self.buffer.split("Final Answer:", 1)[1].strip() + " ▌")
+        else:
+            thoughts = parse_agent_thoughts(self.buffer)
+            if thoughts:
+                self.placeholder.markdown(f"🤔 _{thoughts[0]['content']}_ ▌")
+
+    def on_agent_action(self, action, **kwargs):
+        self.step_count += 1
+        self.placeholder.empty()
+        self.status.update(label=f"Executando o passo {self.step_count}...")
+        self.status.markdown(f"🎬 **Passo {self.step_count}:** `{action.tool}`")
+        self.status.code(str(action.tool_input).strip(), language='python')
+
+    def on_tool_end(self, output, **kwargs):
+        observation = str(output).strip()
+        self.status.text(observation if len(observation) <= 1000 else observation[:1000] + " [...]")
+
+    def finish(self):
+        """Recolhe o painel de passos e libera a área de texto para a resposta final."""
+        self.placeholder.empty()
+        self.status.update(label=f"Análise concluída em {self.step_count} passo(s)", state="complete", expanded=False)
+
+def run_agent(agent, full_prompt, callbacks=()):
+    """Executa o agente uma única vez e retorna (resposta, passos do raciocínio)."""
+    trace_handler = AgentTraceHandler()
+    response_dict = agent.invoke({"input": full_prompt}, config={"callbacks": [trace_handler, *callbacks]})
+    response = response_dict.get('output', 'Não foi possível obter uma resposta.')
+    return response, trace_handler.steps
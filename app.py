@@ -1,10 +1,10 @@
 # --- Importações Essenciais ---
+import importlib
+import threading
 import streamlit as st
 
-# Importa as funções de cada página
-from views.welcome import welcome_screen
-from views.login import login_page
-from views.main_app import main_app
+# As páginas são importadas só quando exibidas: a aplicação principal carrega pandas, LangChain,
+# clientes do Gemini e fpdf, que não são necessários para a primeira tela
 
 # --- CONFIGURAÇÃO DA PÁGINA (DEVE SER O PRIMEIRO COMANDO STREAMLIT) ---
 st.set_page_config(
@@ -13,6 +13,13 @@ st.set_page_config(
     initial_sidebar_state="auto"
 )
 
+@st.cache_resource
+def preload_main_app():
+    """Importa a aplicação principal em segundo plano, uma única vez por processo, enquanto o usuário está no login."""
+    thread = threading.Thread(target=importlib.import_module, args=("views.main_app",), daemon=True)
+    thread.start()
+    return thread
+
 # --- Bloco de Execução Principal (Roteador) ---
 
 # Inicializa o estado da sessão se não existir
@@ -23,8 +30,13 @@ if "logged_in" not in st.session_state:
 
 # Controla qual página é exibida
 if not st.session_state.welcome_seen:
+    from views.welcome import welcome_screen
     welcome_screen()
+    preload_main_app()
 elif not st.session_state.logged_in:
+    from views.login import login_page
     login_page()
+    preload_main_app()
 else:
-    main_app()
\ No newline at end of file
+    from views.main_app import main_app
+    main_app()
@@ -0,0 +1,25 @@
+# --- Importações Essenciais ---
+import base64
+import os
+import streamlit as st
+
+# Só dependências leves aqui: este módulo é usado pelas telas de boas-vindas e de login
+LOGO_PATH = "asset/LOGO.png"
+
+# --- Recursos Estáticos ---
+@st.cache_resource
+def get_logo_bytes():
+    """Conteúdo do logo, lido do disco uma única vez por processo (None se o arquivo não existir)."""
+    if not os.path.exists(LOGO_PATH):
+        return None
+    with open(LOGO_PATH, "rb") as f:
+        return f.read()
+
+@st.cache_resource
+def get_logo_html(width, style=""):
+    """Tag <img> do logo com o PNG embutido em base64, codificada uma única vez por largura e estilo."""
+    logo = get_logo_bytes()
+    if logo is None:
+        return ""
+    data = base64.b64encode(logo).decode("utf-8")
+    return f"<div style='text-align: center;{style}'><img src='data:image/png;base64,{data}' width='{width}'></div>"
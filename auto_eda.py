@@ -0,0 +1,189 @@
+# --- Importações Essenciais ---
+import io
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
+import pandas as pd
+import streamlit as st
+from profiling import format_profile_for_prompt
+from tracing import span
+
+# Processos que desenham os gráficos da análise automática
+AUTO_EDA_WORKERS = int(os.getenv("EDA_AUTO_EDA_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Colunas com gráfico de distribuição e pares de colunas correlacionadas com gráfico de dispersão
+AUTO_EDA_MAX_COLUMNS = int(os.getenv("EDA_AUTO_EDA_MAX_COLUMNS", "40"))
+AUTO_EDA_MAX_PAIRS = int(os.getenv("EDA_AUTO_EDA_MAX_PAIRS", "5"))
+HISTOGRAM_BINS = 30
+TOP_CATEGORIES = 15
+# Pontos desenhados em cada dispersão (amostra fixa, para o gráfico ser o mesmo a cada execução)
+SCATTER_MAX_POINTS = 5000
+# Acima deste intervalo (em dias), as datas são contadas por mês em vez de por dia
+DAILY_MAX_SPAN_DAYS = 366
+
+AUTO_EDA_REQUEST = "Análise exploratória automática do dataset."
+
+# --- Dados dos Gráficos ---
+# Calculados de forma vetorizada no servidor; os processos recebem apenas contagens e amostras pequenas
+def _histogram_spec(name, series):
+    values = series.dropna().to_numpy(dtype="float64")
+    values = values[np.isfinite(values)]
+    if values.size == 0 or values.min() == values.max():
+        return None
+    counts, edges = np.histogram(values, bins=HISTOGRAM_BINS)
+    return {"kind": "histogram", "title": f"Distribuição de {name}", "x": name, "counts": counts, "edges": edges}
+
+def _timeline_spec(name, series):
+    values = series.dropna()
+    if values.empty:
+        return None
+    freq = "D" if (values.max() - values.min()).days <= DAILY_MAX_SPAN_DAYS else "M"
+    counts = values.dt.to_period(freq).value_counts().sort_index()
+    return {
+        "kind": "line", "title": f"Registros por {'dia' if freq == 'D' else 'mês'} em {name}", "x": name,
+        "xs": counts.index.to_timestamp().to_numpy(), "counts": counts.to_numpy(),
+    }
+
+def _bar_spec(name, series):
+    counts = series.value_counts(dropna=True).head(TOP_CATEGORIES)
+    if counts.empty:
+        return None
+    return {
+        "kind": "bar", "title": f"Valores mais frequentes de {name}", "x": name,
+        "labels": [str(value) for value in counts.index], "counts": counts.to_numpy(),
+    }
+
+def _scatter_spec(df, a, b, value):
+    pair = df[[a, b]].dropna()
+    if len(pair) > SCATTER_MAX_POINTS:
+        pair = pair.sample(SCATTER_MAX_POINTS, random_state=0)
+    return {
+        "kind": "scatter", "title": f"{a} x {b} (r = {value:.2f})", "x": a, "y": b,
+        "xs": pair[a].to_numpy(dtype="float64"), "ys": pair[b].to_numpy(dtype="float64"),
+    }
+
+def plot_specs(df, profile):
+    """Um gráfico de distribuição por coluna e um de dispersão para cada par mais correlacionado."""
+    specs = []
+    for col in df.columns[:AUTO_EDA_MAX_COLUMNS]:
+        series = df[col]
+        if pd.api.types.is_bool_dtype(series):
+            spec = _bar_spec(str(col), series)
+        elif pd.api.types.is_numeric_dtype(series):
+            spec = _histogram_spec(str(col), series)
+        elif pd.api.types.is_datetime64_any_dtype(series):
+            spec = _timeline_spec(str(col), series)
+        else:
+            spec = _bar_spec(str(col), series)
+        if spec is not None:
+            specs.append(spec)
+    # O perfil guarda os nomes como texto; as colunas do DataFrame podem ter outro tipo
+    columns = {str(col): col for col in df.columns}
+    for a, b, value in profile["top_correlations"][:AUTO_EDA_MAX_PAIRS]:
+        specs.append(_scatter_spec(df, columns[a], columns[b], value))
+    return specs
+
+# --- Renderização (nos processos do pool) ---
+def _init_worker():
+    import matplotlib
+    matplotlib.use("Agg")
+
+def render_plot(spec):
+    """Desenha o gráfico descrito por `spec` e retorna o PNG em bytes."""
+    from matplotlib.figure import Figure
+    figure = Figure(figsize=(8, 4.5), dpi=100)
+    ax = figure.subplots()
+    kind = spec["kind"]
+    if kind == "histogram":
+        ax.stairs(spec["counts"], spec["edges"], fill=True, alpha=0.8)
+        ax.set_ylabel("frequência")
+    elif kind == "bar":
+        ax.barh(spec["labels"][::-1], spec["counts"][::-1])
+        ax.set_xlabel("frequência")
+    elif kind == "line":
+        ax.plot(spec["xs"], spec["counts"])
+        ax.set_ylabel("registros")
+        figure.autofmt_xdate()
+    elif kind == "scatter":
+        ax.scatter(spec["xs"], spec["ys"], s=6, alpha=0.4)
+        ax.set_ylabel(spec["y"])
+    if kind != "bar":
+        ax.set_xlabel(spec["x"])
+    ax.set_title(spec["title"])
+    figure.tight_layout()
+    buffer = io.BytesIO()
+    figure.savefig(buffer, format="png")
+    return buffer.getvalue()
+
+
+@st.cache_resource
+def get_plot_executor():
+    """Pool de processos compartilhado pelas sessões: os gráficos são desenhados em paralelo, fora do GIL do servidor."""
+    start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return ProcessPoolExecutor(
+        max_workers=AUTO_EDA_WORKERS, mp_context=multiprocessing.get_context(start_method), initializer=_init_worker
+    )
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def get_auto_eda_plots(dataset_hash, _df, _profile):
+    """Gráficos (títulos e PNGs) da análise automática, gerados uma única vez por dataset."""
+    with span("dados dos gráficos"):
+        specs = plot_specs(_df, _profile)
+    with span("renderização dos gráficos", plots=len(specs)):
+        executor = get_plot_executor()
+        try:
+            images = list(executor.map(render_plot, specs))
+        except BrokenProcessPool:
+            # Um processo que morreu (memória, falha do backend) inutiliza o pool inteiro: ele é recriado uma vez
+            executor.shutdown(wait=False, cancel_futures=True)
+            get_plot_executor.clear()
+            images = list(get_plot_executor().map(render_plot, specs))
+    return [spec["title"] for spec in specs], images
+
+# --- Texto da Análise ---
+def stats_table(profile, max_columns=AUTO_EDA_MAX_COLUMNS):
+    """Tabela Markdown com as estatísticas univariadas de cada coluna."""
+    lines = [
+        "| Coluna | Tipo | Ausentes (%) | Distintos | Média | Desvio | Mín | Mediana | Máx |",
+        "|---|---|---|---|---|---|---|---|---|",
+    ]
+    for name, info in list(profile["columns"].items())[:max_columns]:
+        stats = info.get("stats")
+        numbers = [f"{stats[k]:.4g}" for k in ("mean", "std", "min", "50%", "max")] if stats else ["-"] * 5
+        lines.append(f"| {name} | {info['dtype']} | {info['null_pct']} | {info['unique']} | " + " | ".join(numbers) + " |")
+    return "\n".join(lines)
+
+def narrate(profile, plot_titles, llm):
+    """Única chamada ao modelo: a narração dos resultados já calculados."""
+    prompt = f"""
+Você é um analista de dados. A partir do perfil abaixo, calculado automaticamente, escreva em português uma análise exploratória
+com: visão geral do dataset, qualidade dos dados (ausentes e duplicados), destaques das distribuições, correlações mais fortes
+e próximos passos sugeridos. Cite os números do perfil. Use no máximo 300 palavras.
+
+Perfil:
+{format_profile_for_prompt(profile)}
+
+Gráficos gerados: {"; ".join(plot_titles)}
+"""
+    return llm.invoke(prompt).content.strip()
+
+def run_auto_eda(dataset_hash, df, profile, llm, progress=None):
+    """Análise exploratória completa sem o agente: retorna (texto em Markdown, gráficos em PNG)."""
+    progress = progress or (lambda text: None)
+    progress("Gerando os gráficos de cada coluna em paralelo...")
+    plot_titles, images = get_auto_eda_plots(dataset_hash, df, profile)
+    progress("Narrando os resultados...")
+    try:
+        with span("narração"):
+            narration = narrate(profile, plot_titles, llm)
+    except Exception as e:
+        # Sem a narração, as estatísticas e os gráficos continuam válidos
+        narration = f"_Não foi possível gerar a narração da análise ({type(e).__name__}); seguem os resultados calculados._"
+    content = (
+        f"## Análise Exploratória Automática\n\n{narration}\n\n"
+        f"### Estatísticas por coluna\n\n{profile['rows']} linhas, {len(profile['columns'])} colunas, "
+        f"{profile['duplicated_rows']} linhas duplicadas.\n\n{stats_table(profile)}\n\n"
+        f"### Gráficos\n\n" + "\n".join(f"{i}. {title}" for i, title in enumerate(plot_titles, 1))
+    )
+    return content, images
@@ -0,0 +1,245 @@
+"""
+Análise em lote, sem interface: executa um conjunto de perguntas sobre cada CSV de um diretório e gera os relatórios.
+
+Os datasets são processados em paralelo por um pool limitado de threads. Todas as chamadas ao modelo passam
+pelo mesmo escalonador (um único orçamento de requisições e tokens para a chave), e o código gerado pelo
+agente roda nos processos do sandbox, onde os gráficos de cada dataset são capturados separadamente.
+
+Para cada dataset são gravados, em <saída>/<nome do CSV>/: respostas.md, respostas.json, os gráficos em
+figuras/ e o relatório em cada formato pedido. Um resumo de todos os datasets fica em <saída>/resumo.json.
+
+Uso:
+    python batch.py --data-dir dados/ --questions perguntas.txt --output resultados/ \\
+        --model gemini-2.5-flash [--workers 4] [--formats pdf html md] [--rpm 60]
+
+A chave de API é lida de --api-key ou das variáveis GOOGLE_API_KEY / GEMINI_API_KEY.
+"""
+
+# --- Importações Essenciais ---
+import argparse
+import glob
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+DEFAULT_WORKERS = 4
+DEFAULT_FORMATS = ["pdf"]
+HASH_BLOCK_BYTES = 1024 * 1024
+
+# --- Entradas ---
+def load_questions(path):
+    """Perguntas de um JSON (lista de textos) ou de um arquivo de texto, uma por linha (linhas com # são ignoradas)."""
+    with open(path, encoding="utf-8") as f:
+        if path.endswith(".json"):
+            return [str(q).strip() for q in json.load(f) if str(q).strip()]
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+
+def file_hash(path):
+    """Hash do conteúdo do arquivo (o mesmo usado pelo app), calculado em blocos."""
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_BYTES), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def load_csv(path):
+    """Retorna (df, hash) do CSV, reaproveitando a cópia colunar quando o conteúdo já foi convertido antes."""
+    import dataset_store
+    from ingestion import read_csv_optimized
+    content_hash = file_hash(path)
+    if dataset_store.has_dataset(content_hash):
+        return dataset_store.load_dataset(content_hash)[0], content_hash
+    with open(path, "rb") as f:
+        df, memory_report = read_csv_optimized(f, use_pyarrow=dataset_store.STORE_AVAILABLE)
+    # Gravado no armazenamento colunar: os processos do sandbox e o motor SQL o abrem via memory-map
+    dataset_store.save_dataset(content_hash, df, {"name": os.path.basename(path), "memory_report": memory_report})
+    return df, content_hash
+
+# --- Saídas ---
+def write_answers(dataset_dir, name, results):
+    """Grava as respostas em JSON e em Markdown (com links para os gráficos)."""
+    with open(os.path.join(dataset_dir, "respostas.json"), "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    lines = [f"# {name}", ""]
+    for i, result in enumerate(results, 1):
+        lines += [f"## {i}. {result['question']}", ""]
+        lines += [f"**Erro:** {result['error']}" if result["error"] else result["answer"], ""]
+        lines += [f"![Gráfico {i}]({figure})" for figure in result["figures"]]
+        lines.append("")
+    with open(os.path.join(dataset_dir, "respostas.md"), "w", encoding="utf-8") as f:
+        f.write("\n".join(lines))
+
+# --- Análise de um Dataset ---
+def analyze_dataset(csv_path, questions, output_dir, llm, sandbox_pool, report_formats, author):
+    """Responde às perguntas sobre um CSV, em ordem e com o histórico da conversa, e grava respostas, gráficos e relatórios."""
+    from agent import create_agent, build_system_prompt, run_agent
+    from profiling import compute_profile
+    from plot_capture import capture_plots
+    from figure_store import FigureStore, FIGURE_STORE_MAX_MB
+    from conversation_memory import ConversationMemory
+    from report_cache import ReportCache
+    from tracing import start_trace, span, export_trace, TracingCallbackHandler
+    from utils import export_chat_report
+
+    name = os.path.splitext(os.path.basename(csv_path))[0]
+    dataset_dir = os.path.join(output_dir, name)
+    figures_dir = os.path.join(dataset_dir, "figuras")
+    os.makedirs(figures_dir, exist_ok=True)
+    summary = {"dataset": name, "csv": csv_path, "questions": len(questions), "answered": 0, "figures": 0, "reports": [], "error": None}
+    # Cada dataset tem o seu trace (a thread começa sem trace ativo)
+    trace = start_trace(f"lote {name}")
+    session_id = None
+    try:
+        with span("leitura do CSV"):
+            df, dataset_hash = load_csv(csv_path)
+        summary["rows"] = len(df)
+        with span("perfil do dataset"):
+            profile = compute_profile(df)
+        # Processo de execução reservado para o dataset: o código de um dataset não espera o de outro
+        session_id = f"lote-{name}-{dataset_hash}"
+        sandbox_pool.assign(session_id)
+        agent = create_agent(llm, df, dataset_hash, profile, sandbox_pool=sandbox_pool, session_id=session_id)
+        system_prompt = build_system_prompt(profile)
+
+        memory = ConversationMemory()
+        figure_store = FigureStore(FIGURE_STORE_MAX_MB * 1024 * 1024)
+        messages = []
+        results = []
+        for i, question in enumerate(questions, 1):
+            messages.append({"role": "user", "content": question})
+            result = {"question": question, "answer": None, "thoughts": [], "figures": [], "error": None}
+            try:
+                with span(f"pergunta {i}"):
+                    history = memory.build_context(messages[:-1], llm)
+                    full_prompt = f"{system_prompt}\n\n**Contexto da Conversa Anterior:**\n{history}\n\n**Pergunta do Usuário:**\n{question}"
+                    with capture_plots() as captured_images:
+                        answer, thoughts = run_agent(agent, full_prompt, callbacks=[TracingCallbackHandler(trace)])
+            except Exception as e:
+                # Uma pergunta com falha (mesmo após as novas tentativas do escalonador) não interrompe as demais
+                result["error"] = f"{type(e).__name__}: {e}"
+                messages.pop()
+                results.append(result)
+                continue
+            for j, image_bytes in enumerate(captured_images, 1):
+                figure = os.path.join("figuras", f"{i:02d}_{j:02d}.png")
+                with open(os.path.join(dataset_dir, figure), "wb") as f:
+                    f.write(image_bytes)
+                result["figures"].append(figure)
+            message = {"role": "assistant", "content": answer}
+            figure_ids = [figure_store.add(image_bytes) for image_bytes in captured_images]
+            if figure_ids:
+                message["images"] = figure_ids
+            messages.append(message)
+            result.update(answer=answer, thoughts=thoughts)
+            results.append(result)
+            summary["answered"] += 1
+            summary["figures"] += len(figure_ids)
+        write_answers(dataset_dir, name, results)
+
+        if summary["answered"]:
+            report_cache = ReportCache()
+            for report_format in report_formats:
+                # O sumário executivo é gerado uma vez e reaproveitado pelos demais formatos
+                data = export_chat_report(messages, author, llm, figure_store, memory, report_cache, report_format=report_format)
+                report_path = os.path.join(dataset_dir, f"relatorio.{report_format}")
+                with open(report_path, "wb") as f:
+                    f.write(data)
+                summary["reports"].append(report_path)
+    except Exception as e:
+        summary["error"] = f"{type(e).__name__}: {e}"
+    finally:
+        if session_id is not None:
+            sandbox_pool.release(session_id)
+        trace.finish()
+        summary["duration_s"] = round(trace.summary()[0]["duration_ms"] / 1000, 2)
+        try:
+            export_trace(trace)
+        except OSError:
+            pass
+    return summary
+
+# --- Execução do Lote ---
+def run_batch(csv_paths, questions, output_dir, llm, workers=DEFAULT_WORKERS, report_formats=DEFAULT_FORMATS, author="Análise em lote"):
+    """Processa os CSVs em paralelo (no máximo `workers` ao mesmo tempo) e retorna o resumo de cada um."""
+    import matplotlib
+    matplotlib.use("Agg")
+    from sandbox import SandboxPool
+
+    os.makedirs(output_dir, exist_ok=True)
+    # Um processo de execução para cada dataset em andamento (reservado em analyze_dataset)
+    sandbox_pool = SandboxPool(num_workers=workers)
+    summaries = []
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="lote") as executor:
+            futures = [
+                executor.submit(analyze_dataset, path, questions, output_dir, llm, sandbox_pool, report_formats, author)
+                for path in csv_paths
+            ]
+            for future in as_completed(futures):
+                summary = future.result()
+                summaries.append(summary)
+                status = f"erro: {summary['error']}" if summary["error"] else f"{summary['answered']}/{summary['questions']} respostas"
+                print(f"[{len(summaries)}/{len(csv_paths)}] {summary['dataset']}: {status} ({summary['duration_s']}s)", file=sys.stderr)
+    finally:
+        sandbox_pool.shutdown()
+
+    summaries.sort(key=lambda s: s["dataset"])
+    with open(os.path.join(output_dir, "resumo.json"), "w", encoding="utf-8") as f:
+        json.dump(summaries, f, indent=2, ensure_ascii=False)
+    return summaries
+
+def main():
+    parser = argparse.ArgumentParser(description="Executa um conjunto de perguntas sobre cada CSV de um diretório, em paralelo, e gera os relatórios.")
+    parser.add_argument("--data-dir", required=True, help="Diretório com os arquivos CSV.")
+    parser.add_argument("--questions", required=True, help="Perguntas: arquivo de texto (uma por linha) ou JSON (lista).")
+    parser.add_argument("--output", required=True, help="Diretório onde os resultados são gravados.")
+    parser.add_argument("--model", required=True, help="Modelo Gemini (ex.: gemini-2.5-flash).")
+    parser.add_argument("--api-key", help="Chave de API do Gemini (padrão: GOOGLE_API_KEY ou GEMINI_API_KEY).")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Datasets processados ao mesmo tempo.")
+    parser.add_argument("--formats", nargs="+", default=DEFAULT_FORMATS, choices=["pdf", "html", "md"], help="Formatos do relatório.")
+    parser.add_argument("--rpm", type=int, help="Requisições por minuto da chave, somadas entre todos os workers (padrão: EDA_LLM_RPM).")
+    parser.add_argument("--tpm", type=int, help="Tokens por minuto da chave, somados entre todos os workers (padrão: EDA_LLM_TPM).")
+    parser.add_argument("--author", default="Análise em lote", help="Autor exibido nos relatórios.")
+    args = parser.parse_args()
+
+    api_key = args.api_key or os.getenv("GOOGLE_API_KEY") or os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        parser.error("informe a chave de API com --api-key ou GOOGLE_API_KEY.")
+    csv_paths = sorted(glob.glob(os.path.join(args.data_dir, "*.csv")))
+    if not csv_paths:
+        parser.error(f"nenhum arquivo CSV encontrado em {args.data_dir}.")
+    questions = load_questions(args.questions)
+    if not questions:
+        parser.error(f"nenhuma pergunta encontrada em {args.questions}.")
+
+    import logging
+    # Os caches do Streamlit avisam que não há sessão ativa; fora do app isso é esperado
+    logging.disable(logging.WARNING)
+    from gemini_clients import GeminiClientPool
+    from llm_scheduler import LLMScheduler, LLM_REQUESTS_PER_MINUTE, LLM_TOKENS_PER_MINUTE
+
+    # Um único escalonador para todos os workers: o orçamento da chave é dividido entre os datasets
+    scheduler = LLMScheduler(
+        requests_per_minute=args.rpm or LLM_REQUESTS_PER_MINUTE,
+        tokens_per_minute=args.tpm or LLM_TOKENS_PER_MINUTE,
+        max_concurrency=args.workers,
+    )
+    llm = GeminiClientPool(scheduler=scheduler).get_llm(api_key, args.model.replace("models/", ""))
+
+    start = time.monotonic()
+    summaries = run_batch(csv_paths, questions, args.output, llm, args.workers, args.formats, args.author)
+    failed = [s for s in summaries if s["error"]]
+    print(
+        f"{len(summaries) - len(failed)}/{len(summaries)} datasets concluídos em {time.monotonic() - start:.1f}s; "
+        f"resultados em {args.output}",
+        file=sys.stderr
+    )
+    metrics = scheduler.metrics()
+    print(f"Modelo: {metrics['requests']} chamadas, {metrics['retries']} novas tentativas, espera média {metrics['wait_avg_s']:.1f}s", file=sys.stderr)
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
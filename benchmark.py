@@ -0,0 +1,255 @@
+"""
+Benchmark offline do fluxo upload → agente → gráficos → relatório PDF, sem chave de API e sem rede.
+
+O agente usa um modelo roteirizado que repete transcrições ReAct gravadas, e os datasets são CSVs
+sintéticos gerados localmente. Cada tamanho roda em um processo novo, para que o pico de memória
+medido seja só daquele tamanho.
+
+Uso:
+    python benchmark.py --rows 10000 100000 1000000 [--sandbox] [--sample-rows 5000] [--output resultado.json]
+"""
+
+# --- Importações Essenciais ---
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+DEFAULT_ROWS = [10_000, 100_000, 1_000_000]
+GENERATION_CHUNK_ROWS = 500_000
+SUMMARY_RESPONSE = "Sumário executivo do benchmark: estatísticas, distribuição de valor e médias por categoria."
+
+# Transcrições ReAct (uma lista de respostas do modelo por pergunta), no formato emitido pelo Gemini
+DEFAULT_TRANSCRIPTS = [
+    {
+        "question": "Faça um resumo estatístico dos dados.",
+        "responses": [
+            "Thought: Vou calcular as estatísticas descritivas.\nAction: python_repl_ast\nAction Input: df.describe()",
+            "Thought: Tenho as estatísticas.\nFinal Answer: As colunas numéricas têm as estatísticas acima.",
+        ],
+    },
+    {
+        "question": "Crie um histograma da coluna valor.",
+        "responses": [
+            "Thought: Vou gerar o histograma.\nAction: python_repl_ast\nAction Input: "
+            "import matplotlib.pyplot as plt\nplt.figure(figsize=(10, 6))\ndf['valor'].hist(bins=50)\n"
+            "plt.title('Distribuição de valor')\nplt.xlabel('valor')\nplt.ylabel('frequência')\nplt.savefig('plot.png')",
+            "Thought: O gráfico foi salvo.\nFinal Answer: O histograma mostra a distribuição da coluna valor.",
+        ],
+    },
+    {
+        "question": "Qual a média de valor por categoria?",
+        "responses": [
+            "Thought: Vou agrupar por categoria.\nAction: python_repl_ast\nAction Input: df.groupby('categoria', observed=True)['valor'].mean()",
+            "Thought: Tenho as médias.\nFinal Answer: As médias de valor por categoria estão acima.",
+        ],
+    },
+]
+
+# --- Dados Sintéticos ---
+def generate_csv(path, rows, seed=0):
+    """Gera um CSV com colunas numéricas, categóricas, datas e valores ausentes, escrito em blocos."""
+    import numpy as np
+    import pandas as pd
+    rng = np.random.default_rng(seed)
+    categories = np.array([f"cat_{i:02d}" for i in range(20)])
+    cities = np.array([f"cidade_{i:03d}" for i in range(300)])
+    written = 0
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        while written < rows:
+            n = min(GENERATION_CHUNK_ROWS, rows - written)
+            valor = rng.normal(100, 25, n)
+            valor[rng.random(n) < 0.01] = np.nan
+            chunk = pd.DataFrame({
+                "id": np.arange(written, written + n),
+                "valor": valor.round(2),
+                "quantidade": rng.integers(0, 1000, n),
+                "taxa": rng.random(n).round(4),
+                "categoria": categories[rng.integers(0, len(categories), n)],
+                "cidade": cities[rng.integers(0, len(cities), n)],
+                "data": pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 365, n), unit="D"),
+            })
+            chunk.to_csv(f, index=False, header=written == 0)
+            written += n
+
+# --- Modelo Roteirizado ---
+def _scripted_model_class():
+    from langchain_core.language_models.chat_models import BaseChatModel
+    from langchain_core.messages import AIMessage
+    from langchain_core.outputs import ChatGeneration, ChatResult
+    from conversation_memory import estimate_tokens
+
+    class ScriptedChatModel(BaseChatModel):
+        """Substituto determinístico do Gemini: devolve as respostas gravadas, em ordem, com latência opcional."""
+
+        responses: list
+        latency_s: float = 0.0
+        index: int = 0
+
+        @property
+        def _llm_type(self):
+            return "scripted"
+
+        def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+            if self.latency_s:
+                time.sleep(self.latency_s)
+            text = self.responses[self.index % len(self.responses)]
+            self.index += 1
+            input_tokens = sum(estimate_tokens(str(m.content)) for m in messages)
+            output_tokens = estimate_tokens(text)
+            message = AIMessage(content=text, usage_metadata={
+                "input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens,
+            })
+            return ChatResult(generations=[ChatGeneration(message=message)])
+
+    return ScriptedChatModel
+
+# --- Execução de um Tamanho ---
+def run_single(csv_path, rows, transcripts, use_sandbox, llm_latency_s, store_dir, sample_rows=None):
+    """Executa o fluxo completo para um CSV, no processo atual, e retorna as métricas."""
+    os.environ["EDA_DATASET_STORE_DIR"] = store_dir
+    import logging
+    # Os caches do Streamlit avisam que não há sessão ativa; fora do app isso é esperado
+    logging.disable(logging.WARNING)
+    import warnings
+    warnings.filterwarnings("ignore")
+    import matplotlib
+    matplotlib.use("Agg")
+    import dataset_store
+    from agent import create_agent, build_system_prompt, sampling_prompt, run_agent
+    from ingestion import read_csv_optimized, get_sample
+    from profiling import compute_profile
+    from plot_capture import capture_plots
+    from figure_store import FigureStore
+    from conversation_memory import ConversationMemory
+    from report_cache import ReportCache
+    from tracing import start_trace, span, TracingCallbackHandler
+    from utils import export_chat_report
+
+    ScriptedChatModel = _scripted_model_class()
+    trace = start_trace("benchmark")
+    content_hash = f"bench-{rows}"
+
+    with span("leitura do CSV"):
+        with open(csv_path, "rb") as f:
+            df, memory_report = read_csv_optimized(f, use_pyarrow=dataset_store.STORE_AVAILABLE)
+    with span("armazenamento colunar"):
+        dataset_store.save_dataset(content_hash, df, {"name": os.path.basename(csv_path), "memory_report": memory_report})
+    with span("perfil do dataset"):
+        profile = compute_profile(df)
+    sample_spec = ("random", sample_rows, None) if sample_rows and sample_rows < len(df) else None
+
+    agent_llm = ScriptedChatModel(responses=[r for t in transcripts for r in t["responses"]], latency_s=llm_latency_s)
+    summary_llm = ScriptedChatModel(responses=[SUMMARY_RESPONSE], latency_s=llm_latency_s)
+    pool = None
+    with span("construção do agente"):
+        # O mesmo agente do app: ferramentas de perfil e SQL e, com --sandbox, o código no pool de processos
+        if use_sandbox:
+            from sandbox import SandboxPool
+            pool = SandboxPool(num_workers=1)
+        agent = create_agent(agent_llm, df, content_hash, profile, sample_spec, sandbox_pool=pool, session_id="bench")
+    system_prompt = build_system_prompt(profile)
+    if sample_spec:
+        system_prompt += sampling_prompt(len(get_sample(content_hash, sample_spec, df)), len(df))
+
+    memory = ConversationMemory()
+    figure_store = FigureStore(256 * 1024 * 1024)
+    messages = []
+    try:
+        for i, transcript in enumerate(transcripts):
+            question = transcript["question"]
+            messages.append({"role": "user", "content": question})
+            with span(f"pergunta {i + 1}"):
+                with span("histórico da conversa"):
+                    history = memory.build_context(messages[:-1], summary_llm)
+                full_prompt = f"{system_prompt}\n\n**Contexto da Conversa Anterior:**\n{history}\n\n**Pergunta do Usuário:**\n{question}"
+                with capture_plots() as captured_images, span("execução do agente"):
+                    answer, _ = run_agent(agent, full_prompt, callbacks=[TracingCallbackHandler(trace)])
+                with span("armazenamento dos gráficos"):
+                    figure_ids = [figure_store.add(image_bytes) for image_bytes in captured_images]
+            messages.append({"role": "assistant", "content": answer, "images": figure_ids})
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    with span("relatório PDF"):
+        pdf = export_chat_report(messages, "benchmark", summary_llm, figure_store, memory, ReportCache(), report_format="pdf")
+    trace.finish()
+
+    stages = {}
+    for row in trace.summary():
+        if row["depth"] >= 1 and not row["name"].startswith("pergunta"):
+            stages[row["name"]] = round(stages.get(row["name"], 0.0) + row["duration_ms"], 1)
+    return {
+        "rows": rows,
+        "csv_bytes": os.path.getsize(csv_path),
+        "dataframe_bytes": memory_report["optimized_bytes"],
+        "stages_ms": stages,
+        "total_ms": trace.summary()[0]["duration_ms"],
+        # ru_maxrss é informado em KB no Linux
+        "peak_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        "pdf_bytes": len(pdf),
+        "figures": sum(len(m.get("images", [])) for m in messages),
+    }
+
+# --- Relatório ---
+def format_results(results):
+    """Tabela em Markdown com as etapas nas linhas e os tamanhos de dataset nas colunas."""
+    stage_names = []
+    for result in results:
+        stage_names += [name for name in result["stages_ms"] if name not in stage_names]
+    header = "| Etapa | " + " | ".join(f"{r['rows']:,} linhas" for r in results) + " |"
+    lines = [header, "|---" * (len(results) + 1) + "|"]
+    for name in stage_names:
+        lines.append(f"| {name} (ms) | " + " | ".join(str(r["stages_ms"].get(name, "-")) for r in results) + " |")
+    lines.append("| **total (ms)** | " + " | ".join(str(r["total_ms"]) for r in results) + " |")
+    lines.append("| pico de RSS (MB) | " + " | ".join(f"{r['peak_rss_bytes'] / 1024 ** 2:.0f}" for r in results) + " |")
+    lines.append("| DataFrame (MB) | " + " | ".join(f"{r['dataframe_bytes'] / 1024 ** 2:.1f}" for r in results) + " |")
+    lines.append("| PDF (KB) | " + " | ".join(f"{r['pdf_bytes'] / 1024:.0f}" for r in results) + " |")
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark offline do fluxo upload → agente → gráficos → PDF.")
+    parser.add_argument("--rows", type=int, nargs="+", default=DEFAULT_ROWS, help="Tamanhos dos datasets sintéticos (linhas).")
+    parser.add_argument("--transcripts", help="JSON com transcrições ReAct gravadas: [{\"question\": ..., \"responses\": [...]}].")
+    parser.add_argument("--sandbox", action="store_true", help="Executa o código do agente no pool de processos isolados.")
+    parser.add_argument("--sample-rows", type=int, help="Modo amostragem: o agente explora uma amostra aleatória com estas linhas.")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="Latência simulada de cada chamada ao modelo.")
+    parser.add_argument("--data-dir", help="Diretório dos CSVs gerados (reaproveitados entre execuções).")
+    parser.add_argument("--output", help="Grava os resultados em JSON neste arquivo.")
+    args = parser.parse_args()
+
+    transcripts = DEFAULT_TRANSCRIPTS
+    if args.transcripts:
+        with open(args.transcripts, encoding="utf-8") as f:
+            transcripts = json.load(f)
+
+    with tempfile.TemporaryDirectory(prefix="eda-bench-") as tmp:
+        data_dir = args.data_dir or tmp
+        os.makedirs(data_dir, exist_ok=True)
+        results = []
+        for rows in args.rows:
+            csv_path = os.path.join(data_dir, f"bench_{rows}.csv")
+            if not os.path.exists(csv_path):
+                print(f"Gerando {csv_path}...", file=sys.stderr)
+                generate_csv(csv_path, rows)
+            print(f"Executando {rows:,} linhas...", file=sys.stderr)
+            # Processo novo por tamanho: o pico de memória e os caches não se misturam entre as medições
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+                results.append(executor.submit(
+                    run_single, csv_path, rows, transcripts, args.sandbox, args.llm_latency_ms / 1000, os.path.join(tmp, "store"),
+                    args.sample_rows
+                ).result())
+
+    print(format_results(results))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+
+if __name__ == "__main__":
+    main()
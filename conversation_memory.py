@@ -0,0 +1,94 @@
+# --- Importações Essenciais ---
+import os
+import threading
+import streamlit as st
+
+# Orçamento aproximado de tokens para os turnos recentes enviados na íntegra ao agente
+HISTORY_TOKEN_BUDGET = int(os.getenv("EDA_HISTORY_TOKEN_BUDGET", "2000"))
+# Tamanho máximo (em caracteres) de uma única mensagem no contexto
+MAX_MESSAGE_CHARS = 2000
+
+def estimate_tokens(text):
+    """Estimativa local de tokens (~4 caracteres por token), sem chamadas ao modelo."""
+    return len(text) // 4 + 1
+
+def format_message(message):
+    """Formata uma mensagem como linha de histórico, truncando textos muito longos."""
+    content = message["content"]
+    if len(content) > MAX_MESSAGE_CHARS:
+        content = content[:MAX_MESSAGE_CHARS] + " [...]"
+    return f" - {message['role']}: {content}"
+
+# --- Memória da Conversa ---
+class ConversationMemory:
+    """Mantém os turnos recentes na íntegra e um resumo acumulado dos anteriores, atualizado de forma incremental."""
+
+    def __init__(self, token_budget=HISTORY_TOKEN_BUDGET):
+        self.token_budget = token_budget
+        self.summary = ""
+        # Quantas mensagens (do início do histórico) já estão incorporadas ao resumo
+        self.summarized_count = 0
+        # O relatório em segundo plano também usa a memória, em paralelo ao chat
+        self._lock = threading.Lock()
+
+    def _recent_start(self, messages, budget):
+        """Índice da mensagem mais antiga que ainda cabe no orçamento, contando a partir da mais recente."""
+        used, start = 0, len(messages)
+        for i in range(len(messages) - 1, self.summarized_count - 1, -1):
+            cost = estimate_tokens(format_message(messages[i]))
+            if used + cost > budget:
+                break
+            used += cost
+            start = i
+        return start
+
+    def _summarize(self, new_messages, llm):
+        turns = "\n".join(format_message(m) for m in new_messages)
+        prompt = f"""
+Atualize o resumo de uma conversa entre um usuário e um agente de IA sobre uma análise de dados.
+Preserve as perguntas feitas, os resultados numéricos relevantes e as conclusões. Use no máximo 200 palavras, em português.
+
+Resumo atual:
+{self.summary or "(vazio)"}
+
+Novos turnos:
+{turns}
+
+Resumo atualizado:"""
+        return llm.invoke(prompt).content.strip()
+
+    def build_context(self, messages, llm):
+        """Histórico condensado: resumo dos turnos antigos seguido dos turnos recentes dentro do orçamento."""
+        with self._lock:
+            return self._build_context(messages, llm)
+
+    def _build_context(self, messages, llm):
+        if self.summarized_count > len(messages):
+            self.summary, self.summarized_count = "", 0
+
+        start = self._recent_start(messages, self.token_budget)
+        if start > self.summarized_count:
+            # Ao estourar o orçamento, resume até a metade dele, para que os próximos turnos não exijam um novo resumo
+            start = self._recent_start(messages, self.token_budget // 2)
+            try:
+                self.summary = self._summarize(messages[self.summarized_count:start], llm)
+                self.summarized_count = start
+            except Exception:
+                # Sem resumo nesta rodada: os turnos antigos ficam fora do contexto e o resumo é tentado de novo no próximo turno
+                pass
+
+        parts = []
+        if self.summary:
+            parts.append(f"Resumo dos turnos anteriores: {self.summary}")
+        parts += [format_message(m) for m in messages[start:]]
+        return "\n".join(parts)
+
+
+def get_conversation_memory():
+    """Retorna a memória da conversa da sessão atual."""
+    if "conversation_memory" not in st.session_state:
+        st.session_state.conversation_memory = ConversationMemory()
+    return st.session_state.conversation_memory
+
+def reset_conversation_memory():
+    st.session_state.pop("conversation_memory", None)
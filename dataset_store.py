@@ -0,0 +1,109 @@
+# --- Importações Essenciais ---
+import json
+import os
+import time
+import uuid
+
+# PyArrow é necessário para o armazenamento colunar; sem ele o armazenamento fica desativado
+try:
+    import pyarrow.feather as feather
+    STORE_AVAILABLE = True
+except ImportError:
+    feather = None
+    STORE_AVAILABLE = False
+
+# Diretório local onde os datasets convertidos são mantidos
+STORE_DIR = os.getenv("EDA_DATASET_STORE_DIR", ".dataset_store")
+# Espaço máximo em disco (em MB) ocupado pelo armazenamento
+STORE_MAX_MB = int(os.getenv("EDA_DATASET_STORE_MB", "20480"))
+
+# --- Caminhos ---
+def _data_path(content_hash):
+    return os.path.join(STORE_DIR, f"{content_hash}.feather")
+
+def _meta_path(content_hash):
+    return os.path.join(STORE_DIR, f"{content_hash}.json")
+
+def has_dataset(content_hash):
+    """Indica se o dataset já foi convertido para o formato colunar."""
+    return STORE_AVAILABLE and os.path.exists(_data_path(content_hash)) and os.path.exists(_meta_path(content_hash))
+
+# --- Escrita ---
+def save_dataset(content_hash, df, metadata):
+    """Grava o DataFrame como Feather (Arrow IPC) sem compressão, permitindo memory-map na leitura."""
+    if not STORE_AVAILABLE:
+        return False
+    os.makedirs(STORE_DIR, exist_ok=True)
+    metadata = dict(metadata, hash=content_hash, rows=len(df), columns=len(df.columns), saved_at=time.time())
+
+    # Escreve em arquivos temporários e renomeia, para que leitores concorrentes nunca vejam um arquivo parcial
+    tmp_suffix = f".{uuid.uuid4().hex}.tmp"
+    data_tmp = _data_path(content_hash) + tmp_suffix
+    meta_tmp = _meta_path(content_hash) + tmp_suffix
+    try:
+        feather.write_feather(df, data_tmp, compression="uncompressed")
+        with open(meta_tmp, "w", encoding="utf-8") as f:
+            json.dump(metadata, f, ensure_ascii=False)
+        os.replace(data_tmp, _data_path(content_hash))
+        os.replace(meta_tmp, _meta_path(content_hash))
+    except Exception:
+        # Colunas com tipos mistos não são representáveis em Arrow; o dataset segue apenas em memória
+        for path in (data_tmp, meta_tmp):
+            if os.path.exists(path):
+                os.remove(path)
+        return False
+
+    _enforce_size_limit()
+    return True
+
+# --- Leitura ---
+def load_dataset(content_hash):
+    """Abre o dataset via memory-map e retorna (df, metadados); as colunas são compartilhadas com o arquivo sempre que possível."""
+    table = feather.read_table(_data_path(content_hash), memory_map=True)
+    with open(_meta_path(content_hash), encoding="utf-8") as f:
+        metadata = json.load(f)
+    # Atualiza a data de acesso, usada como critério de remoção (LRU)
+    os.utime(_meta_path(content_hash))
+    return table.to_pandas(split_blocks=True), metadata
+
+def load_arrow_table(content_hash):
+    """Abre o dataset como tabela Arrow via memory-map, sem converter para pandas (usado pelo motor SQL)."""
+    os.utime(_meta_path(content_hash))
+    return feather.read_table(_data_path(content_hash), memory_map=True)
+
+def list_datasets():
+    """Lista os metadados dos datasets armazenados, do acesso mais recente ao mais antigo."""
+    if not STORE_AVAILABLE or not os.path.isdir(STORE_DIR):
+        return []
+    datasets = []
+    for filename in os.listdir(STORE_DIR):
+        if not filename.endswith(".json"):
+            continue
+        content_hash = filename[:-len(".json")]
+        if not has_dataset(content_hash):
+            continue
+        try:
+            with open(_meta_path(content_hash), encoding="utf-8") as f:
+                metadata = json.load(f)
+        except (OSError, ValueError):
+            continue
+        metadata["last_access"] = os.path.getmtime(_meta_path(content_hash))
+        datasets.append(metadata)
+    return sorted(datasets, key=lambda m: m["last_access"], reverse=True)
+
+# --- Limpeza ---
+def _enforce_size_limit():
+    """Remove os datasets acessados há mais tempo até o armazenamento caber no limite."""
+    max_bytes = STORE_MAX_MB * 1024 * 1024
+    datasets = list_datasets()
+    total = sum(os.path.getsize(_data_path(m["hash"])) for m in datasets)
+    # Nunca remove o dataset mais recente, mesmo que ele sozinho ultrapasse o limite
+    for metadata in reversed(datasets[1:]):
+        if total <= max_bytes:
+            break
+        total -= os.path.getsize(_data_path(metadata["hash"]))
+        for path in (_data_path(metadata["hash"]), _meta_path(metadata["hash"])):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
@@ -0,0 +1,95 @@
+# --- Importações Essenciais ---
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+import streamlit as st
+from PIL import Image, features
+from session_store import get_session_store
+
+# Orçamento de memória (em MB) dos gráficos mantidos por sessão
+FIGURE_STORE_MAX_MB = int(os.getenv("EDA_FIGURE_STORE_MB", "64"))
+# Largura máxima (em pixels) dos gráficos armazenados
+FIGURE_MAX_WIDTH = int(os.getenv("EDA_FIGURE_MAX_WIDTH", "1600"))
+WEBP_AVAILABLE = features.check("webp")
+
+# --- Compressão ---
+def compress_image(image_bytes, max_width=FIGURE_MAX_WIDTH):
+    """Reduz a imagem à largura máxima e a recodifica em WebP sem perdas (ou PNG otimizado), mantendo a menor versão."""
+    with Image.open(io.BytesIO(image_bytes)) as original:
+        image = original
+        if image.width > max_width:
+            image = image.resize((max_width, round(image.height * max_width / image.width)), Image.LANCZOS)
+        buffer = io.BytesIO()
+        if WEBP_AVAILABLE:
+            image.save(buffer, format="WEBP", lossless=True)
+        else:
+            image.save(buffer, format="PNG", optimize=True)
+    compressed = buffer.getvalue()
+    return compressed if len(compressed) < len(image_bytes) else image_bytes
+
+# --- Armazenamento de Gráficos ---
+class FigureStore:
+    """Guarda os gráficos da sessão como bytes comprimidos, deduplicados por hash e com remoção LRU."""
+
+    def __init__(self, max_bytes, backing=None):
+        self.max_bytes = max_bytes
+        # Função que busca um gráfico removido da memória em outro armazenamento (ex.: o banco das análises)
+        self.backing = backing
+        self.current_bytes = 0
+        self._figures = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, image_bytes):
+        """Armazena a imagem e retorna o seu identificador (hash do conteúdo original)."""
+        figure_id = hashlib.blake2b(image_bytes, digest_size=16).hexdigest()
+        with self._lock:
+            if figure_id in self._figures:
+                self._figures.move_to_end(figure_id)
+                return figure_id
+        self._put(figure_id, compress_image(image_bytes))
+        return figure_id
+
+    def add_compressed(self, figure_id, compressed):
+        """Armazena uma imagem já comprimida por outro FigureStore, com o identificador que ela recebeu lá."""
+        self._put(figure_id, compressed)
+        return figure_id
+
+    def _put(self, figure_id, compressed):
+        with self._lock:
+            if figure_id in self._figures:
+                return
+            self._figures[figure_id] = compressed
+            self.current_bytes += len(compressed)
+            # Remove os gráficos menos acessados, preservando sempre o mais recente
+            while self.current_bytes > self.max_bytes and len(self._figures) > 1:
+                _, evicted = self._figures.popitem(last=False)
+                self.current_bytes -= len(evicted)
+
+    def get(self, figure_id):
+        """Retorna os bytes da imagem, ou None se ela já tiver sido removida (e não estiver no armazenamento de apoio)."""
+        with self._lock:
+            data = self._figures.get(figure_id)
+            if data is not None:
+                self._figures.move_to_end(figure_id)
+                return data
+        if self.backing is None:
+            return None
+        data = self.backing(figure_id)
+        if data is not None:
+            self._put(figure_id, data)
+        return data
+
+    def clear(self):
+        with self._lock:
+            self._figures.clear()
+            self.current_bytes = 0
+
+
+def get_figure_store():
+    """Retorna o armazenamento de gráficos da sessão atual."""
+    if "figure_store" not in st.session_state:
+        # Gráficos que saíram da memória continuam disponíveis no banco das análises
+        st.session_state.figure_store = FigureStore(FIGURE_STORE_MAX_MB * 1024 * 1024, backing=get_session_store().get_figure)
+    return st.session_state.figure_store
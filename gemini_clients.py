@@ -0,0 +1,152 @@
+# --- Importações Essenciais ---
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any
+import streamlit as st
+from google import genai
+from google.genai import errors
+from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
+from conversation_memory import estimate_tokens
+from llm_scheduler import LLMScheduler
+
+# Validade (em segundos) do catálogo de modelos e da validação de cada chave
+MODEL_CATALOG_TTL_S = int(os.getenv("EDA_MODEL_CATALOG_TTL_S", "3600"))
+# Quantidade de chaves de API com clientes mantidos abertos
+CLIENT_POOL_MAX_KEYS = int(os.getenv("EDA_CLIENT_POOL_MAX_KEYS", "64"))
+# Códigos HTTP com que a API recusa uma chave inválida ou sem permissão
+INVALID_KEY_CODES = (400, 401, 403)
+
+
+class InvalidApiKeyError(Exception):
+    pass
+
+# --- Cliente de Chat com Escalonamento ---
+def _usage_tokens(message):
+    usage = getattr(message, "usage_metadata", None)
+    return usage.get("total_tokens") if usage else None
+
+
+class ScheduledChatGoogleGenerativeAI(ChatGoogleGenerativeAI):
+    """ChatGoogleGenerativeAI cujas chamadas passam pelo LLMScheduler (orçamento por chave, fila e novas tentativas)."""
+
+    scheduler: Any = None
+    key_id: str = ""
+
+    def _estimate(self, messages):
+        return sum(estimate_tokens(str(m.content)) for m in messages)
+
+    def _generate(self, messages, *args, **kwargs):
+        return self.scheduler.call(
+            self.key_id, self._estimate(messages),
+            lambda: super(ScheduledChatGoogleGenerativeAI, self)._generate(messages, *args, **kwargs),
+            count_tokens=lambda result: _usage_tokens(result.generations[0].message) if result.generations else None
+        )
+
+    def _stream(self, messages, *args, **kwargs):
+        return self.scheduler.stream(
+            self.key_id, self._estimate(messages),
+            lambda: super(ScheduledChatGoogleGenerativeAI, self)._stream(messages, *args, **kwargs),
+            count_tokens=lambda chunk: _usage_tokens(chunk.message)
+        )
+
+# --- Pool de Clientes ---
+class _KeyEntry:
+    """Clientes e catálogo de modelos de uma chave de API."""
+
+    def __init__(self, api_key, fingerprint):
+        self.api_key = api_key
+        self.fingerprint = fingerprint
+        # Cliente HTTP com conexões persistentes, reaproveitado em todas as consultas ao catálogo
+        self.client = genai.Client(api_key=api_key)
+        # Catálogo (ou a recusa da chave) e o instante da consulta
+        self.models = None
+        self.invalid = False
+        self.models_at = 0.0
+        self.llms = {}
+        self.embeddings = {}
+        self.lock = threading.Lock()
+
+
+class GeminiClientPool:
+    """Um conjunto de clientes por chave de API, compartilhado pelo processo, com o catálogo de modelos em cache (TTL)."""
+
+    def __init__(self, max_keys=CLIENT_POOL_MAX_KEYS, catalog_ttl=MODEL_CATALOG_TTL_S, scheduler=None):
+        self.max_keys = max_keys
+        self.catalog_ttl = catalog_ttl
+        # Todas as chamadas de chat, de todas as sessões, passam pelo mesmo escalonador
+        self.scheduler = scheduler or LLMScheduler()
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _entry(self, api_key):
+        # A chave é identificada pelo hash, para não ficar exposta nas chaves do dicionário
+        fingerprint = hashlib.blake2b(api_key.encode(), digest_size=16).hexdigest()
+        with self._lock:
+            entry = self._entries.get(fingerprint)
+            if entry is None:
+                entry = self._entries[fingerprint] = _KeyEntry(api_key, fingerprint)
+                while len(self._entries) > self.max_keys:
+                    self._entries.popitem(last=False)
+            self._entries.move_to_end(fingerprint)
+            return entry
+
+    def list_models(self, api_key):
+        """Modelos com suporte a generateContent; consulta a API no máximo uma vez por TTL e por chave."""
+        entry = self._entry(api_key)
+        with entry.lock:
+            if time.monotonic() - entry.models_at < self.catalog_ttl:
+                if entry.invalid:
+                    raise InvalidApiKeyError("Chave de API recusada pela API do Gemini.")
+                if entry.models is not None:
+                    return entry.models
+            try:
+                models = [
+                    m.name for m in entry.client.models.list()
+                    if "generateContent" in (m.supported_actions or [])
+                ]
+            except errors.ClientError as e:
+                # Só a recusa da chave fica em cache; falhas de rede são tentadas de novo na próxima chamada
+                if e.code in INVALID_KEY_CODES:
+                    entry.invalid, entry.models_at = True, time.monotonic()
+                    raise InvalidApiKeyError(str(e)) from e
+                raise
+            entry.models, entry.invalid, entry.models_at = models, False, time.monotonic()
+            return models
+
+    def validate(self, api_key):
+        """Valida a chave listando os modelos; o catálogo obtido fica em cache para a primeira página."""
+        try:
+            self.list_models(api_key)
+            return True
+        except InvalidApiKeyError:
+            return False
+
+    def get_llm(self, api_key, model_name):
+        """Cliente de chat do modelo para a chave, criado uma única vez e compartilhado entre as sessões."""
+        entry = self._entry(api_key)
+        with entry.lock:
+            if model_name not in entry.llms:
+                # streaming=True faz o modelo emitir tokens aos callbacks; invoke() continua retornando a resposta completa.
+                # Uma única tentativa por chamada no SDK: as novas tentativas ficam a cargo do escalonador
+                entry.llms[model_name] = ScheduledChatGoogleGenerativeAI(
+                    model=model_name, temperature=0, streaming=True, google_api_key=api_key, max_retries=1,
+                    scheduler=self.scheduler, key_id=entry.fingerprint
+                )
+            return entry.llms[model_name]
+
+    def get_embeddings(self, api_key, model_name):
+        """Cliente de embeddings do modelo para a chave, criado uma única vez."""
+        entry = self._entry(api_key)
+        with entry.lock:
+            if model_name not in entry.embeddings:
+                entry.embeddings[model_name] = GoogleGenerativeAIEmbeddings(model=model_name, google_api_key=api_key)
+            return entry.embeddings[model_name]
+
+
+@st.cache_resource
+def get_client_pool():
+    """Instância única do pool de clientes, compartilhada por todas as sessões do servidor."""
+    return GeminiClientPool()
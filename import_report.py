@@ -0,0 +1,80 @@
+"""
+Relatório do tempo de importação de cada página do app, medido em processos novos (como após um restart).
+
+Compara o roteador antigo, que importava todas as páginas antes da primeira tela, com a importação
+sob demanda de cada página, e lista os pacotes mais caros de uma delas (via `python -X importtime`).
+
+Uso:
+    python import_report.py [--repeat 3] [--top 15] [--detail views.main_app]
+"""
+
+# --- Importações Essenciais ---
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+# O que cada cenário importa antes de desenhar a primeira tela
+SCENARIOS = [
+    ("roteador antigo (todas as páginas)", ["views.welcome", "views.login", "views.main_app"]),
+    ("boas-vindas", ["views.welcome"]),
+    ("login", ["views.login"]),
+    ("aplicação principal", ["views.main_app"]),
+    ("streamlit (referência)", ["streamlit"]),
+]
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+\d+\s+\|\s*(\S+)")
+
+def _run(modules, importtime=False):
+    """Importa os módulos em um interpretador novo e retorna (segundos, saída de erro)."""
+    code = (
+        "import time\n"
+        "start = time.perf_counter()\n"
+        + "".join(f"import {m}\n" for m in modules)
+        + "print(time.perf_counter() - start)\n"
+    )
+    command = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", code]
+    result = subprocess.run(
+        command, capture_output=True, text=True, check=True,
+        cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    return float(result.stdout.strip().splitlines()[-1]), result.stderr
+
+def measure(modules, repeat):
+    """Menor tempo de importação (em segundos) entre as repetições."""
+    return min(_run(modules)[0] for _ in range(repeat))
+
+def heaviest_packages(module, top):
+    """Pacotes mais caros ao importar `module`: tempo próprio (em ms) somado sobre todos os seus submódulos."""
+    _, stderr = _run([module], importtime=True)
+    totals = {}
+    for line in stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            package = match.group(2).split(".")[0]
+            totals[package] = totals.get(package, 0) + int(match.group(1)) / 1000
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)[:top]
+
+def main():
+    parser = argparse.ArgumentParser(description="Tempo de importação das páginas do app, em processos novos.")
+    parser.add_argument("--repeat", type=int, default=3, help="Repetições de cada cenário (vale o menor tempo).")
+    parser.add_argument("--top", type=int, default=15, help="Quantidade de pacotes listados no detalhamento.")
+    parser.add_argument("--detail", default="views.main_app", help="Página detalhada por pacote.")
+    args = parser.parse_args()
+
+    results = [(name, measure(modules, args.repeat)) for name, modules in SCENARIOS]
+    before = results[0][1]
+    print("| Cenário | Importação (ms) | Ganho sobre o roteador antigo |")
+    print("|---|---|---|")
+    for name, seconds in results:
+        gain = f"{before / seconds:.1f}x" if seconds else "-"
+        print(f"| {name} | {seconds * 1000:.0f} | {gain} |")
+
+    print(f"\nPacotes mais caros ao importar `{args.detail}`:\n")
+    print("| Pacote | Tempo próprio (ms) |")
+    print("|---|---|")
+    for name, ms in heaviest_packages(args.detail, args.top):
+        print(f"| {name} | {ms:.0f} |")
+
+if __name__ == "__main__":
+    main()
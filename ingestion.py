@@ -0,0 +1,229 @@
+# --- Importações Essenciais ---
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+import streamlit as st
+import dataset_store
+from sampling import make_sample
+
+# PyArrow é opcional: quando instalado, habilita o motor de leitura multithread
+try:
+    import pyarrow  # noqa: F401
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+# Limite de memória (em MB) do cache de DataFrames compartilhado entre sessões
+DATAFRAME_CACHE_MAX_MB = int(os.getenv("EDA_DATAFRAME_CACHE_MB", "4096"))
+# Quantidade de linhas lidas por bloco no carregamento em streaming
+CSV_CHUNK_ROWS = int(os.getenv("EDA_CSV_CHUNK_ROWS", "200000"))
+# Proporção máxima de valores distintos para uma coluna de texto virar 'category'
+CATEGORY_MAX_RATIO = 0.5
+
+# --- Cache LRU de DataFrames ---
+class DataFrameCache:
+    """Cache LRU de DataFrames indexado pelo hash do conteúdo, limitado pelo tamanho em memória."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._loading = {}
+
+    def get(self, key):
+        """Retorna (df, info) do item em cache, ou None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0], entry[2]
+
+    def put(self, key, df, info=None):
+        size = int(df.memory_usage(deep=True).sum())
+        with self._lock:
+            if key in self._entries:
+                self.current_bytes -= self._entries.pop(key)[1]
+            # Um DataFrame maior que o limite total nunca é armazenado
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (df, size, info)
+            self.current_bytes += size
+            # Remove os itens menos usados até voltar ao limite
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+
+    def get_or_load(self, key, loader):
+        """Retorna (df, info) do cache ou executa o loader uma única vez, mesmo com sessões concorrentes."""
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+        with self._lock:
+            key_lock = self._loading.setdefault(key, threading.Lock())
+        with key_lock:
+            cached = self.get(key)
+            if cached is None:
+                cached = loader()
+                self.put(key, *cached)
+        with self._lock:
+            self._loading.pop(key, None)
+        return cached
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+
+@st.cache_resource
+def get_dataframe_cache():
+    """Instância única do cache, compartilhada por todas as sessões do servidor."""
+    return DataFrameCache(DATAFRAME_CACHE_MAX_MB * 1024 * 1024)
+
+# --- Hash do Conteúdo ---
+def get_content_hash(uploaded_file):
+    """Calcula o hash do conteúdo do arquivo enviado, memorizado por upload na sessão."""
+    file_id = getattr(uploaded_file, "file_id", None)
+    known_hashes = st.session_state.setdefault("dataset_hashes", {})
+    if file_id and file_id in known_hashes:
+        return known_hashes[file_id]
+
+    # getvalue() devolve os bytes do upload sem copiá-los
+    content_hash = hashlib.blake2b(uploaded_file.getvalue(), digest_size=20).hexdigest()
+    if file_id:
+        known_hashes[file_id] = content_hash
+    return content_hash
+
+# --- Otimização de Tipos ---
+def _is_categorical(series):
+    return isinstance(series.dtype, pd.CategoricalDtype)
+
+def downcast_numeric(df):
+    """Reduz colunas numéricas ao menor tipo que representa os valores sem perda."""
+    for col in df.select_dtypes(include="integer").columns:
+        df[col] = pd.to_numeric(df[col], downcast="integer")
+    for col in df.select_dtypes(include="floating").columns:
+        values = df[col].to_numpy()
+        if values.dtype != np.float64:
+            continue
+        as_float32 = values.astype(np.float32)
+        # Só converte para float32 quando todos os valores são preservados exatamente
+        if np.array_equal(as_float32.astype(values.dtype), values, equal_nan=True):
+            df[col] = as_float32
+    return df
+
+def categorize_strings(df, max_ratio=CATEGORY_MAX_RATIO):
+    """Converte colunas de texto com poucos valores distintos para 'category'."""
+    if len(df) == 0:
+        return df
+    for col in df.select_dtypes(include=["object", "string"]).columns:
+        if df[col].nunique(dropna=True) / len(df) <= max_ratio:
+            df[col] = df[col].astype("category")
+    return df
+
+def _combine_chunks(chunks):
+    """Concatena os blocos lidos, unindo as categorias de cada coluna sem voltar para texto."""
+    if len(chunks) == 1:
+        return chunks[0].reset_index(drop=True)
+    columns = {}
+    for col in chunks[0].columns:
+        pieces = [chunk[col] for chunk in chunks]
+        reference = next((piece for piece in pieces if _is_categorical(piece)), None)
+        if reference is not None:
+            # Blocos em que a coluna veio toda vazia são lidos como número; entram na união como categoria vazia
+            empty = pd.CategoricalDtype(pd.Index([], dtype=reference.cat.categories.dtype))
+            pieces = [
+                piece.astype(empty) if not _is_categorical(piece) and piece.isna().all() else piece
+                for piece in pieces
+            ]
+        if all(_is_categorical(piece) for piece in pieces):
+            columns[col] = pd.Series(union_categoricals(pieces, ignore_order=True), name=col)
+        else:
+            pieces = [piece.astype(piece.cat.categories.dtype) if _is_categorical(piece) else piece for piece in pieces]
+            columns[col] = pd.concat(pieces, ignore_index=True)
+    return pd.DataFrame(columns)
+
+def _decategorize_high_cardinality(df, max_ratio=CATEGORY_MAX_RATIO):
+    """Desfaz a conversão de colunas que, no arquivo inteiro, têm valores distintos demais."""
+    if len(df) == 0:
+        return df
+    for col in df.columns:
+        if _is_categorical(df[col]) and len(df[col].cat.categories) / len(df) > max_ratio:
+            df[col] = df[col].astype(df[col].cat.categories.dtype)
+    return df
+
+# --- Leitura Otimizada do CSV ---
+def read_csv_optimized(buffer, use_pyarrow=False, chunk_rows=CSV_CHUNK_ROWS):
+    """Lê o CSV em blocos otimizando os tipos de cada bloco e retorna (df, relatório de memória)."""
+    raw_bytes = 0
+    chunks = []
+    if use_pyarrow and PYARROW_AVAILABLE:
+        # O motor PyArrow lê o arquivo inteiro de uma vez (sem blocos), porém em várias threads
+        reader = [pd.read_csv(buffer, engine="pyarrow")]
+    else:
+        reader = pd.read_csv(buffer, chunksize=chunk_rows)
+
+    for chunk in reader:
+        raw_bytes += int(chunk.memory_usage(deep=True).sum())
+        # Todo texto vira categoria em cada bloco: a proporção de valores distintos só vale para o arquivo
+        # inteiro (um bloco final curto não a atinge) e é verificada depois da união dos blocos
+        chunks.append(categorize_strings(downcast_numeric(chunk), max_ratio=1.0))
+
+    if not chunks:
+        df = pd.DataFrame()
+    else:
+        df = _combine_chunks(chunks)
+    del chunks
+    df = downcast_numeric(_decategorize_high_cardinality(df))
+
+    memory_report = {
+        "raw_bytes": raw_bytes,
+        "optimized_bytes": int(df.memory_usage(deep=True).sum()),
+    }
+    return df, memory_report
+
+def format_bytes(num_bytes):
+    """Formata um tamanho em bytes de forma legível."""
+    for unit in ["B", "KB", "MB", "GB"]:
+        if abs(num_bytes) < 1024:
+            return f"{num_bytes:.1f} {unit}"
+        num_bytes /= 1024
+    return f"{num_bytes:.1f} TB"
+
+# --- Carregamento do Dataset ---
+def _load_from_store(content_hash):
+    df, metadata = dataset_store.load_dataset(content_hash)
+    return df, metadata["memory_report"]
+
+def load_dataframe(uploaded_file, use_pyarrow=False):
+    """Retorna (df, hash, relatório de memória) do arquivo enviado, lendo o CSV apenas na primeira vez que o conteúdo é visto."""
+    content_hash = get_content_hash(uploaded_file)
+
+    def load():
+        # Conteúdo já convertido antes (inclusive em sessões ou execuções anteriores do servidor)
+        if dataset_store.has_dataset(content_hash):
+            return _load_from_store(content_hash)
+        uploaded_file.seek(0)
+        df, memory_report = read_csv_optimized(uploaded_file, use_pyarrow=use_pyarrow)
+        dataset_store.save_dataset(content_hash, df, {"name": uploaded_file.name, "memory_report": memory_report})
+        return df, memory_report
+
+    df, memory_report = get_dataframe_cache().get_or_load(content_hash, load)
+    # Cópia rasa (sem custo com Copy-on-Write): alterações feitas pela sessão não afetam o cache
+    return df.copy(deep=False), content_hash, memory_report
+
+@st.cache_resource(max_entries=16, show_spinner="Gerando a amostra do dataset...")
+def get_sample(dataset_hash, sample_spec, _df):
+    """Amostra do dataset, gerada uma única vez por (hash, configuração da amostra)."""
+    return make_sample(_df, sample_spec)
+
+def load_stored_dataframe(content_hash):
+    """Reabre um dataset do armazenamento local sem precisar do upload; retorna (df, relatório de memória)."""
+    df, memory_report = get_dataframe_cache().get_or_load(content_hash, lambda: _load_from_store(content_hash))
+    return df.copy(deep=False), memory_report
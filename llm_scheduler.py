@@ -0,0 +1,213 @@
+# --- Importações Essenciais ---
+import contextvars
+import heapq
+import itertools
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+import httpx
+from google.genai import errors
+
+# Orçamento por chave de API em uma janela de 60 segundos, e chamadas simultâneas por chave
+LLM_REQUESTS_PER_MINUTE = int(os.getenv("EDA_LLM_RPM", "60"))
+LLM_TOKENS_PER_MINUTE = int(os.getenv("EDA_LLM_TPM", "1000000"))
+LLM_MAX_CONCURRENCY = int(os.getenv("EDA_LLM_MAX_CONCURRENCY", "4"))
+# Novas tentativas para erros transitórios (cota, sobrecarga, rede), com espera exponencial e aleatória
+LLM_MAX_RETRIES = int(os.getenv("EDA_LLM_MAX_RETRIES", "5"))
+BACKOFF_BASE_S = 1.0
+BACKOFF_MAX_S = 60.0
+WINDOW_S = 60.0
+TRANSIENT_STATUS_CODES = (408, 429, 500, 502, 503, 504)
+
+# Prioridades: o menor valor é atendido primeiro
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 1
+_priority = contextvars.ContextVar("llm_priority", default=PRIORITY_INTERACTIVE)
+
+@contextmanager
+def llm_priority(priority):
+    """Define a prioridade das chamadas ao modelo feitas dentro do bloco (ex.: relatórios em segundo plano)."""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+# --- Classificação de Erros ---
+def _error_chain(error):
+    while error is not None:
+        yield error
+        error = error.__cause__ or error.__context__
+
+def is_transient(error):
+    """Erros que podem passar com uma nova tentativa: cota excedida, sobrecarga do serviço ou falha de rede."""
+    for e in _error_chain(error):
+        if isinstance(e, errors.APIError) and e.code in TRANSIENT_STATUS_CODES:
+            return True
+        if isinstance(e, (httpx.TransportError, TimeoutError, ConnectionError)):
+            return True
+    return False
+
+def retry_delay(error, attempt):
+    """Espera antes da próxima tentativa: a sugerida pela API (retryDelay) ou exponencial com variação aleatória."""
+    match = re.search(r"retryDelay['\"]?\s*:\s*['\"]?(\d+(?:\.\d+)?)s", str(error))
+    if match:
+        return float(match.group(1)) + random.uniform(0, BACKOFF_BASE_S)
+    delay = min(BACKOFF_MAX_S, BACKOFF_BASE_S * 2 ** attempt)
+    # Metade fixa e metade aleatória: sessões que falharam juntas não tentam de novo ao mesmo tempo
+    return delay / 2 + random.uniform(0, delay / 2)
+
+# --- Escalonador ---
+class _KeyBudget:
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.queue = []
+        # Chamadas da janela atual: [instante, tokens]
+        self.history = deque()
+        self.active = 0
+
+
+class LLMScheduler:
+    """Fila com prioridade na frente das chamadas ao modelo, respeitando o orçamento de requisições e tokens de cada chave."""
+
+    def __init__(self, requests_per_minute=LLM_REQUESTS_PER_MINUTE, tokens_per_minute=LLM_TOKENS_PER_MINUTE,
+                 max_concurrency=LLM_MAX_CONCURRENCY, max_retries=LLM_MAX_RETRIES):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self._budgets = {}
+        self._lock = threading.Lock()
+        self._sequence = itertools.count()
+        self._stats = {"requests": 0, "retries": 0, "failures": 0, "wait_total_s": 0.0, "wait_max_s": 0.0}
+
+    def _budget(self, key_id):
+        with self._lock:
+            return self._budgets.setdefault(key_id, _KeyBudget())
+
+    def _wait_time(self, budget, tokens, now):
+        """Segundos até a chamada caber no orçamento; 0 se pode seguir e None se depende de outra terminar."""
+        while budget.history and now - budget.history[0][0] > WINDOW_S:
+            budget.history.popleft()
+        if budget.active >= self.max_concurrency:
+            return None
+        if len(budget.history) >= self.requests_per_minute:
+            return budget.history[0][0] + WINDOW_S - now
+        used = sum(record[1] for record in budget.history)
+        if budget.history and used + tokens > self.tokens_per_minute:
+            return budget.history[0][0] + WINDOW_S - now
+        return 0
+
+    def acquire(self, key_id, tokens):
+        """Aguarda a vez da chamada (por prioridade e ordem de chegada) e reserva o orçamento."""
+        budget = self._budget(key_id)
+        item = (_priority.get(), next(self._sequence))
+        start = time.monotonic()
+        with budget.cond:
+            heapq.heappush(budget.queue, item)
+            try:
+                while True:
+                    wait = None
+                    if budget.queue[0] is item:
+                        wait = self._wait_time(budget, tokens, time.monotonic())
+                        if wait == 0:
+                            break
+                    budget.cond.wait(timeout=wait)
+            except BaseException:
+                budget.queue.remove(item)
+                heapq.heapify(budget.queue)
+                budget.cond.notify_all()
+                raise
+            heapq.heappop(budget.queue)
+            record = [time.monotonic(), tokens]
+            budget.history.append(record)
+            budget.active += 1
+            # O próximo da fila reavalia o orçamento
+            budget.cond.notify_all()
+
+        waited = time.monotonic() - start
+        with self._lock:
+            self._stats["requests"] += 1
+            self._stats["wait_total_s"] += waited
+            self._stats["wait_max_s"] = max(self._stats["wait_max_s"], waited)
+        return record
+
+    def release(self, key_id, record, used_tokens=None):
+        """Libera a vaga da chamada; com o uso real de tokens, corrige a estimativa reservada."""
+        budget = self._budget(key_id)
+        with budget.cond:
+            budget.active -= 1
+            if used_tokens:
+                record[1] = used_tokens
+            budget.cond.notify_all()
+
+    def _retry_or_raise(self, error, attempt):
+        if attempt >= self.max_retries or not is_transient(error):
+            with self._lock:
+                self._stats["failures"] += 1
+            raise error
+        with self._lock:
+            self._stats["retries"] += 1
+        time.sleep(retry_delay(error, attempt))
+
+    def call(self, key_id, tokens, fn, count_tokens=lambda result: None):
+        """Executa fn() dentro do orçamento da chave, repetindo em erros transitórios."""
+        for attempt in itertools.count():
+            record = self.acquire(key_id, tokens)
+            used = None
+            try:
+                result = fn()
+                used = count_tokens(result)
+                return result
+            except Exception as e:
+                error = e
+            finally:
+                self.release(key_id, record, used)
+            self._retry_or_raise(error, attempt)
+
+    def stream(self, key_id, tokens, fn, count_tokens=lambda chunk: None):
+        """Versão para respostas em streaming; só repete se o erro ocorrer antes do primeiro trecho."""
+        for attempt in itertools.count():
+            record = self.acquire(key_id, tokens)
+            started, used = False, 0
+            try:
+                for chunk in fn():
+                    started = True
+                    used += count_tokens(chunk) or 0
+                    yield chunk
+                return
+            except Exception as e:
+                # Trechos já entregues não podem ser desfeitos: nesse caso o erro é repassado
+                if started:
+                    raise
+                error = e
+            finally:
+                self.release(key_id, record, used)
+            self._retry_or_raise(error, attempt)
+
+    def metrics(self):
+        """Profundidade da fila, chamadas em andamento e tempos de espera, por chave e no total."""
+        now = time.monotonic()
+        with self._lock:
+            budgets = list(self._budgets.values())
+            stats = dict(self._stats)
+        queued = active = window_requests = window_tokens = 0
+        for budget in budgets:
+            with budget.cond:
+                queued += len(budget.queue)
+                active += budget.active
+                recent = [record for record in budget.history if now - record[0] <= WINDOW_S]
+                window_requests += len(recent)
+                window_tokens += sum(record[1] for record in recent)
+        stats.update(
+            queued=queued,
+            active=active,
+            window_requests=window_requests,
+            window_tokens=window_tokens,
+            wait_avg_s=stats["wait_total_s"] / stats["requests"] if stats["requests"] else 0.0,
+        )
+        return stats
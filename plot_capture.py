@@ -0,0 +1,49 @@
+# --- Importações Essenciais ---
+import functools
+import io
+import os
+import threading
+from contextlib import contextmanager
+from matplotlib.figure import Figure
+
+# Lista de captura ativa na thread atual (cada sessão do Streamlit executa o agente na sua própria thread)
+_capture_state = threading.local()
+
+# --- Gancho no savefig ---
+def _install_savefig_hook():
+    """Intercepta os gráficos salvos em arquivo durante uma execução do agente e os guarda em memória como PNG."""
+    if getattr(Figure.savefig, "_capture_hook", False):
+        return
+    original_savefig = Figure.savefig
+
+    @functools.wraps(original_savefig)
+    def savefig(self, fname, *args, **kwargs):
+        captured = getattr(_capture_state, "images", None)
+        if captured is None or not isinstance(fname, (str, os.PathLike)):
+            return original_savefig(self, fname, *args, **kwargs)
+        buffer = io.BytesIO()
+        kwargs["format"] = "png"
+        original_savefig(self, buffer, *args, **kwargs)
+        captured.append(buffer.getvalue())
+
+    savefig._capture_hook = True
+    Figure.savefig = savefig
+
+_install_savefig_hook()
+
+# --- Captura por Execução ---
+@contextmanager
+def capture_plots():
+    """Captura, como bytes PNG, os gráficos salvos pela thread atual durante o bloco."""
+    captured = []
+    _capture_state.images = captured
+    try:
+        yield captured
+    finally:
+        _capture_state.images = None
+
+def record_captured_image(image_bytes):
+    """Adiciona à captura ativa da thread atual um gráfico produzido fora dela (ex.: em um processo do sandbox)."""
+    captured = getattr(_capture_state, "images", None)
+    if captured is not None:
+        captured.append(image_bytes)
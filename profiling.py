@@ -0,0 +1,97 @@
+# --- Importações Essenciais ---
+import numpy as np
+import pandas as pd
+import streamlit as st
+from langchain_core.tools import Tool
+
+# Limites que mantêm o perfil pequeno o bastante para caber no prompt
+TOP_VALUES = 5
+MAX_CORRELATION_COLUMNS = 50
+TOP_CORRELATIONS = 10
+MAX_PROMPT_COLUMNS = 60
+
+# --- Cálculo do Perfil ---
+def compute_profile(df):
+    """Calcula, de forma vetorizada, tipos, estatísticas, valores ausentes, cardinalidade, valores frequentes e correlações."""
+    null_counts = df.isna().sum()
+    # Durações (timedelta) contam como número para o pandas, mas as suas estatísticas não são floats
+    numeric_df = df.select_dtypes(include="number", exclude="timedelta")
+    numeric_stats = numeric_df.describe(percentiles=[0.25, 0.5, 0.75]).T if not numeric_df.empty else pd.DataFrame()
+
+    columns = {}
+    for col in df.columns:
+        series = df[col]
+        info = {
+            "dtype": str(series.dtype),
+            "nulls": int(null_counts[col]),
+            "null_pct": round(float(null_counts[col]) / len(df) * 100, 2) if len(df) else 0.0,
+            "unique": int(series.nunique(dropna=True)),
+        }
+        if col in numeric_stats.index:
+            stats = numeric_stats.loc[col]
+            info["stats"] = {name: float(stats[name]) for name in ["mean", "std", "min", "25%", "50%", "75%", "max"]}
+        else:
+            top_values = series.value_counts(dropna=True).head(TOP_VALUES)
+            info["top_values"] = {str(value): int(count) for value, count in top_values.items()}
+        columns[str(col)] = info
+
+    # Correlação de Pearson entre as colunas numéricas, limitada para não crescer quadraticamente
+    correlations = []
+    corr_columns = numeric_df.columns[:MAX_CORRELATION_COLUMNS]
+    if len(corr_columns) > 1:
+        corr = numeric_df[corr_columns].corr()
+        upper = corr.where(np.triu(np.ones(corr.shape, dtype=bool), k=1)).stack().dropna()
+        strongest = upper.reindex(upper.abs().sort_values(ascending=False).index).head(TOP_CORRELATIONS)
+        correlations = [(str(a), str(b), round(float(value), 3)) for (a, b), value in strongest.items()]
+
+    return {
+        "rows": len(df),
+        "columns": columns,
+        "duplicated_rows": int(df.duplicated().sum()),
+        "top_correlations": correlations,
+    }
+
+@st.cache_data(max_entries=32, show_spinner="Calculando o perfil do dataset...")
+def get_dataset_profile(dataset_hash, _df):
+    """Perfil do dataset, calculado uma única vez por hash do conteúdo."""
+    return compute_profile(_df)
+
+# --- Formatação ---
+def _format_column(name, info):
+    line = f"- {name} ({info['dtype']}): {info['unique']} distintos, {info['nulls']} ausentes ({info['null_pct']}%)"
+    if "stats" in info:
+        stats = info["stats"]
+        line += f"; média={stats['mean']:.4g}, dp={stats['std']:.4g}, min={stats['min']:.4g}, q1={stats['25%']:.4g}, mediana={stats['50%']:.4g}, q3={stats['75%']:.4g}, max={stats['max']:.4g}"
+    elif info.get("top_values"):
+        line += "; mais frequentes: " + ", ".join(f"{value} ({count})" for value, count in info["top_values"].items())
+    return line
+
+def format_profile_for_prompt(profile, max_columns=MAX_PROMPT_COLUMNS):
+    """Resumo compacto do perfil para ser incluído no prompt do agente."""
+    lines = [f"{profile['rows']} linhas, {len(profile['columns'])} colunas, {profile['duplicated_rows']} linhas duplicadas."]
+    items = list(profile["columns"].items())
+    lines += [_format_column(name, info) for name, info in items[:max_columns]]
+    if len(items) > max_columns:
+        lines.append(f"- ... mais {len(items) - max_columns} colunas (consulte a ferramenta dataset_profile).")
+    if profile["top_correlations"]:
+        lines.append("Correlações mais fortes: " + ", ".join(f"{a} x {b} = {value}" for a, b, value in profile["top_correlations"]))
+    return "\n".join(lines)
+
+# --- Ferramenta do Agente ---
+def make_profile_tool(profile):
+    """Ferramenta que responde, sem executar código, com o perfil de uma coluna ou do dataset inteiro."""
+    def lookup(query):
+        column = query.strip().strip("'\"`")
+        if column in profile["columns"]:
+            return _format_column(column, profile["columns"][column])
+        return format_profile_for_prompt(profile, max_columns=len(profile["columns"]))
+
+    return Tool(
+        name="dataset_profile",
+        func=lookup,
+        description=(
+            "Perfil pré-calculado do dataframe `df`: tipos, estatísticas descritivas, valores ausentes, "
+            "cardinalidade, valores mais frequentes e correlações. Responde instantaneamente. "
+            "Input: o nome de uma coluna, ou 'all' para o perfil completo."
+        )
+    )
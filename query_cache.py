@@ -0,0 +1,125 @@
+# --- Importações Essenciais ---
+import hashlib
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+import numpy as np
+import streamlit as st
+from report_cache import message_digest
+
+# Quantidade máxima de respostas mantidas e tempo de validade de cada uma (em segundos)
+QUERY_CACHE_MAX_ENTRIES = int(os.getenv("EDA_QUERY_CACHE_MAX_ENTRIES", "512"))
+QUERY_CACHE_TTL_S = int(os.getenv("EDA_QUERY_CACHE_TTL_S", "86400"))
+# Memória máxima (em MB) das respostas mantidas, somando textos e gráficos comprimidos
+QUERY_CACHE_MAX_MB = int(os.getenv("EDA_QUERY_CACHE_MB", "64"))
+# Busca por similaridade de embeddings além da correspondência exata (desativada por padrão)
+QUERY_CACHE_SEMANTIC = os.getenv("EDA_QUERY_CACHE_SEMANTIC", "0") == "1"
+QUERY_CACHE_SIMILARITY = float(os.getenv("EDA_QUERY_CACHE_SIMILARITY", "0.95"))
+
+# --- Normalização ---
+def normalize_prompt(prompt):
+    """Normaliza a pergunta para comparação: minúsculas, sem acentos, sem pontuação e espaços repetidos."""
+    text = unicodedata.normalize("NFKD", prompt.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = re.sub(r"[^\w\s]", " ", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+def result_size(result):
+    """Tamanho aproximado (em bytes) de um resultado: texto, pensamentos e gráficos comprimidos."""
+    return (
+        len(result["content"].encode("utf-8"))
+        + len(str(result["thoughts"]).encode("utf-8"))
+        + sum(len(data) for _, data in result["figures"])
+    )
+
+def query_scope(dataset_hash, sample_spec=None, history=()):
+    """Escopo de uma pergunta no cache: dataset, amostra e a conversa anterior enviada junto com ela."""
+    # Respostas obtidas sobre uma amostra não valem para o dataset completo (e vice-versa)
+    scope = f"{dataset_hash}:{sample_spec}" if sample_spec else dataset_hash
+    if not history:
+        return scope
+    # Perguntas de continuação ("e para a coluna Y?") dependem do histórico: só valem na mesma conversa
+    h = hashlib.blake2b(digest_size=16)
+    for message in history:
+        h.update(message_digest(message).encode())
+    return f"{scope}:{h.hexdigest()}"
+
+# --- Cache de Respostas ---
+class QueryCache:
+    """Cache LRU com validade (TTL) das respostas do agente por (dataset, pergunta normalizada, modelo), limitado pelo tamanho em memória."""
+
+    def __init__(self, max_entries=QUERY_CACHE_MAX_ENTRIES, ttl_seconds=QUERY_CACHE_TTL_S, similarity_threshold=QUERY_CACHE_SIMILARITY, max_bytes=QUERY_CACHE_MAX_MB * 1024 * 1024):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _expired(self, entry):
+        return time.time() - entry["created_at"] > self.ttl_seconds
+
+    def _remove(self, key):
+        self.current_bytes -= self._entries.pop(key)["size"]
+
+    def get(self, dataset_hash, model_name, normalized_prompt):
+        """Retorna a resposta armazenada para exatamente a mesma pergunta, ou None."""
+        key = (dataset_hash, model_name, normalized_prompt)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self._expired(entry):
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry["result"]
+
+    def get_similar(self, dataset_hash, model_name, embedding):
+        """Retorna a resposta da pergunta mais parecida (similaridade de cosseno acima do limite), ou None."""
+        query = np.asarray(embedding, dtype=np.float32)
+        query /= np.linalg.norm(query) or 1.0
+        best_key, best_score = None, self.similarity_threshold
+        with self._lock:
+            for key, entry in list(self._entries.items()):
+                if key[:2] != (dataset_hash, model_name) or entry["embedding"] is None:
+                    continue
+                if self._expired(entry):
+                    self._remove(key)
+                    continue
+                score = float(np.dot(query, entry["embedding"]))
+                if score >= best_score:
+                    best_key, best_score = key, score
+            if best_key is None:
+                return None
+            self._entries.move_to_end(best_key)
+            return self._entries[best_key]["result"]
+
+    def put(self, dataset_hash, model_name, normalized_prompt, result, embedding=None):
+        """Armazena o resultado (resposta, pensamentos e gráficos como pares (id, bytes comprimidos)) de uma pergunta."""
+        if embedding is not None:
+            embedding = np.asarray(embedding, dtype=np.float32)
+            embedding /= np.linalg.norm(embedding) or 1.0
+        key = (dataset_hash, model_name, normalized_prompt)
+        size = result_size(result)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            # Uma resposta maior que o limite total nunca é armazenada
+            if size > self.max_bytes:
+                return
+            self._entries[key] = {"result": result, "embedding": embedding, "created_at": time.time(), "size": size}
+            self.current_bytes += size
+            # Remove as respostas menos usadas até voltar aos limites de quantidade e de memória
+            while len(self._entries) > self.max_entries or self.current_bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+
+@st.cache_resource
+def get_query_cache():
+    """Instância única do cache de respostas, compartilhada por todas as sessões do servidor."""
+    return QueryCache()
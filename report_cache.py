@@ -0,0 +1,89 @@
+# --- Importações Essenciais ---
+import hashlib
+import streamlit as st
+from conversation_memory import format_message
+
+# --- Identificação das Mensagens ---
+def message_digest(message):
+    """Hash do conteúdo de uma mensagem (papel, texto e gráficos), usado como chave dos caches do relatório."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(message["role"].encode())
+    h.update(b"\0" + message["content"].encode())
+    for figure_id in message.get("images", []):
+        h.update(b"\0" + figure_id.encode())
+    return h.hexdigest()
+
+# --- Cache do Relatório ---
+class ReportCache:
+    """Guarda o sumário executivo, os blocos já preparados de cada mensagem e o último arquivo gerado em cada formato."""
+
+    def __init__(self):
+        self.summary = ""
+        # Hashes das mensagens já incorporadas ao sumário, na ordem da conversa
+        self.summary_digests = []
+        self.blocks = {}
+        # Último arquivo gerado por formato: (chave do conteúdo, bytes)
+        self.outputs = {}
+
+    def executive_summary(self, messages, digests, llm, memory):
+        """Sumário executivo da conversa; se ela só cresceu, apenas as mensagens novas são enviadas ao modelo."""
+        if digests == self.summary_digests:
+            return self.summary
+
+        covered = len(self.summary_digests)
+        if self.summary and digests[:covered] == self.summary_digests:
+            turns = "\n".join(format_message(m) for m in messages[covered:])
+            prompt = f"""
+Você é um analista de dados sênior. Abaixo está o sumário executivo de uma conversa entre um usuário e um agente de IA sobre uma análise de dados, seguido dos novos turnos da conversa.
+Atualize o sumário (2 a 3 parágrafos, em português) incorporando as novas perguntas, análises e conclusões. Ignore saudações e foque nos resultados.
+
+Sumário Executivo Atual:
+---
+{self.summary}
+---
+
+Novos Turnos:
+---
+{turns}
+---
+
+Sumário Executivo Atualizado:"""
+        else:
+            # Reaproveita o resumo acumulado da conversa; só os turnos ainda não resumidos são processados
+            conversation_history = memory.build_context(messages, llm)
+            prompt = f"""
+Você é um analista de dados sênior. Sua tarefa é ler o histórico de uma conversa entre um usuário e um agente de IA sobre uma análise de dados e escrever um sumário executivo conciso em português (2 a 3 parágrafos).
+O sumário deve destacar as principais perguntas feitas, as análises realizadas e os insights ou conclusões mais importantes encontrados. Ignore saudações e foque nos resultados.
+
+Histórico da Conversa:
+---
+{conversation_history}
+---
+
+Sumário Executivo:"""
+
+        self.summary = llm.invoke(prompt).content
+        self.summary_digests = list(digests)
+        return self.summary
+
+    def get_block(self, digest, build):
+        """Bloco preparado da mensagem (texto e imagens prontas para o relatório), construído uma única vez."""
+        if digest not in self.blocks:
+            self.blocks[digest] = build()
+        return self.blocks[digest]
+
+    def prune_blocks(self, digests):
+        """Descarta os blocos de mensagens que não fazem mais parte da conversa."""
+        current = set(digests)
+        for digest in [d for d in self.blocks if d not in current]:
+            del self.blocks[digest]
+
+
+def get_report_cache():
+    """Retorna o cache do relatório da sessão atual."""
+    if "report_cache" not in st.session_state:
+        st.session_state.report_cache = ReportCache()
+    return st.session_state.report_cache
+
+def reset_report_cache():
+    st.session_state.pop("report_cache", None)
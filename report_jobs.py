@@ -0,0 +1,70 @@
+# --- Importações Essenciais ---
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+import streamlit as st
+from utils import export_chat_report
+from llm_scheduler import llm_priority, PRIORITY_BACKGROUND
+from tracing import start_trace, export_trace
+
+# Quantidade de relatórios gerados em paralelo no servidor
+REPORT_WORKERS = int(os.getenv("EDA_REPORT_WORKERS", "2"))
+# Formatos disponíveis: rótulo -> (extensão, tipo MIME)
+REPORT_FORMATS = {
+    "PDF": ("pdf", "application/pdf"),
+    "HTML": ("html", "text/html"),
+    "Markdown": ("md", "text/markdown"),
+}
+
+# --- Tarefas de Geração ---
+class ReportJob:
+    """Estado de uma geração de relatório em segundo plano: progresso, mensagem e, ao final, os bytes do arquivo."""
+
+    def __init__(self, report_format):
+        self.id = uuid.uuid4().hex
+        self.report_format = report_format
+        self.progress = 0.0
+        self.message = "Na fila..."
+        self.result = None
+        self.error = None
+        self.done = False
+
+    def update(self, fraction, message):
+        self.progress = min(max(fraction, 0.0), 1.0)
+        self.message = message
+
+    def run(self, *args):
+        trace = start_trace("relatório")
+        try:
+            extension = REPORT_FORMATS[self.report_format][0]
+            # As chamadas do relatório cedem a vez às perguntas feitas no chat
+            with llm_priority(PRIORITY_BACKGROUND):
+                self.result = export_chat_report(*args, report_format=extension, progress=self.update)
+            self.update(1.0, "Relatório pronto.")
+        except Exception as e:
+            self.error = str(e)
+        finally:
+            trace.finish()
+            try:
+                export_trace(trace)
+            except OSError:
+                pass
+            self.done = True
+
+
+@st.cache_resource
+def get_report_executor():
+    """Pool de threads compartilhado pelas sessões; a geração não bloqueia a execução do script da sessão."""
+    return ThreadPoolExecutor(max_workers=REPORT_WORKERS, thread_name_prefix="report")
+
+def submit_report_job(report_format, messages, user_name, llm, figure_store, memory, report_cache):
+    """Envia a geração do relatório para o pool e registra a tarefa na sessão."""
+    job = ReportJob(report_format)
+    # Cópia da lista: novas mensagens do chat não alteram o relatório em andamento
+    get_report_executor().submit(job.run, list(messages), user_name, llm, figure_store, memory, report_cache)
+    st.session_state.report_job = job
+    return job
+
+def get_report_job():
+    """Tarefa de relatório mais recente da sessão, ou None."""
+    return st.session_state.get("report_job")
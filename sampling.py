@@ -0,0 +1,35 @@
+# --- Importações Essenciais ---
+import math
+
+# Semente fixa: a mesma configuração sempre gera a mesma amostra (inclusive nos processos do sandbox)
+SAMPLE_SEED = 42
+# Cardinalidade máxima de uma coluna usada para estratificar a amostra
+MAX_STRATA = 50
+
+# --- Amostragem ---
+def make_sample(df, sample_spec):
+    """Gera a amostra descrita por sample_spec = (método, tamanho, coluna de estratificação)."""
+    method, size, column = sample_spec
+    if size >= len(df):
+        return df
+    if method == "stratified" and column in df.columns:
+        # Alocação proporcional: cada grupo contribui com a mesma fração das suas linhas
+        sample = df.groupby(column, observed=True, dropna=False, group_keys=False).sample(
+            frac=size / len(df), random_state=SAMPLE_SEED
+        )
+        return sample.sort_index()
+    return df.sample(n=size, random_state=SAMPLE_SEED).sort_index()
+
+def stratification_candidates(profile):
+    """Colunas com poucos valores distintos, adequadas para estratificar a amostra."""
+    return [
+        name for name, info in profile["columns"].items()
+        if 2 <= info["unique"] <= MAX_STRATA
+    ]
+
+def margin_of_error(sample_rows, total_rows, z=1.96):
+    """Margem de erro (95%) de uma proporção estimada na amostra, com correção para população finita."""
+    if sample_rows >= total_rows or sample_rows == 0:
+        return 0.0
+    finite_correction = math.sqrt((total_rows - sample_rows) / (total_rows - 1))
+    return z * math.sqrt(0.25 / sample_rows) * finite_correction
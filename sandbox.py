@@ -0,0 +1,239 @@
+# --- Importações Essenciais ---
+import multiprocessing
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Type
+from langchain_core.tools import BaseTool
+from langchain_experimental.tools.python.tool import PythonInputs
+from pydantic import BaseModel
+import dataset_store
+import plot_capture
+from sampling import make_sample
+
+# Quantidade de processos que executam o código gerado pelo agente
+SANDBOX_WORKERS = int(os.getenv("EDA_SANDBOX_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Tempo máximo (em segundos) de cada execução de código
+SANDBOX_TIMEOUT_S = float(os.getenv("EDA_SANDBOX_TIMEOUT_S", "60"))
+# Memória anônima máxima (em MB) de cada processo; acima disso o processo é encerrado
+SANDBOX_MAX_RSS_MB = int(os.getenv("EDA_SANDBOX_MAX_RSS_MB", "2048"))
+# Quantos datasets e sessões cada processo mantém carregados
+WORKER_MAX_DATASETS = 2
+WORKER_MAX_SESSIONS = 32
+# Tempo máximo (em segundos) para um processo novo terminar de importar as bibliotecas
+WORKER_STARTUP_TIMEOUT_S = 120
+
+# --- Processo de Execução ---
+def _limit_memory(max_bytes):
+    """Limite rígido da memória de dados do processo: uma alocação acima dele falha com MemoryError na hora."""
+    try:
+        import resource
+    except ImportError:
+        return
+    # As áreas já reservadas pelas bibliotecas importadas não contam contra o limite das execuções
+    limit = _proc_status(os.getpid(), "VmData:") + max_bytes
+    try:
+        resource.setrlimit(resource.RLIMIT_DATA, (limit, limit))
+    except (ValueError, OSError):
+        pass
+
+def _worker_main(conn, max_memory_bytes=None):
+    """Laço do processo: recebe código, executa com o DataFrame da sessão e devolve a saída e os gráficos."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    from langchain_experimental.tools.python.tool import PythonAstREPLTool
+    if max_memory_bytes:
+        _limit_memory(max_memory_bytes)
+    # Avisa que as importações terminaram; o limite de tempo das execuções não inclui a inicialização
+    conn.send({"ready": True})
+
+    datasets = OrderedDict()
+    sessions = OrderedDict()
+    while True:
+        try:
+            request = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+
+        dataset_hash = request["dataset"]
+        if "df" in request:
+            datasets[dataset_hash] = request["df"]
+        elif dataset_hash not in datasets:
+            if not dataset_store.has_dataset(dataset_hash):
+                conn.send({"missing_dataset": True})
+                continue
+            # O arquivo colunar é aberto via memory-map: as páginas ficam compartilhadas entre os processos
+            datasets[dataset_hash] = dataset_store.load_dataset(dataset_hash)[0]
+        datasets.move_to_end(dataset_hash)
+        while len(datasets) > WORKER_MAX_DATASETS:
+            datasets.popitem(last=False)
+
+        # Cada sessão mantém as suas variáveis entre chamadas, como no PythonAstREPLTool original
+        sample_spec = request.get("sample")
+        session_key = (request["session"], dataset_hash, sample_spec)
+        if session_key not in sessions:
+            full_df = datasets[dataset_hash]
+            if sample_spec:
+                # Modo amostragem: `df` é a amostra e `df_full` o dataset completo
+                local_vars = {"df": make_sample(full_df, sample_spec), "df_full": full_df.copy(deep=False)}
+            else:
+                local_vars = {"df": full_df.copy(deep=False)}
+            sessions[session_key] = PythonAstREPLTool(locals=local_vars)
+        sessions.move_to_end(session_key)
+        while len(sessions) > WORKER_MAX_SESSIONS:
+            sessions.popitem(last=False)
+
+        with plot_capture.capture_plots() as captured_images:
+            try:
+                output = str(sessions[session_key].run(request["code"]))
+            except Exception as e:
+                output = f"{type(e).__name__}: {e}"
+        plt.close("all")
+        conn.send({"output": output, "images": captured_images})
+
+def _proc_status(pid, field):
+    """Valor (em bytes) de um campo de /proc/<pid>/status (Linux), ou 0 se não estiver disponível."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith(field):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+def _anonymous_rss(pid):
+    """Memória anônima do processo (Linux); páginas de arquivos mapeados não entram na conta."""
+    return _proc_status(pid, "RssAnon:")
+
+# --- Pool de Processos ---
+class _Worker:
+    def __init__(self, context, max_memory_bytes=None):
+        self.context = context
+        self.max_memory_bytes = max_memory_bytes
+        self.lock = threading.Lock()
+        self._start()
+
+    def _start(self):
+        parent_conn, child_conn = self.context.Pipe()
+        self.process = self.context.Process(target=_worker_main, args=(child_conn, self.max_memory_bytes), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.conn = parent_conn
+        self.loaded_datasets = set()
+        self.ready = False
+
+    def wait_ready(self):
+        if not self.ready:
+            if not self.conn.poll(WORKER_STARTUP_TIMEOUT_S):
+                raise RuntimeError("O processo de execução não inicializou a tempo.")
+            self.conn.recv()
+            self.ready = True
+
+    def restart(self):
+        """Encerra o processo (cancelando o que estiver em execução) e inicia um novo."""
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+        self._start()
+
+
+class SandboxPool:
+    """Pool de processos pré-iniciados que executam o código do agente fora do servidor, com tempo e memória limitados."""
+
+    def __init__(self, num_workers=SANDBOX_WORKERS, timeout=SANDBOX_TIMEOUT_S, max_rss_mb=SANDBOX_MAX_RSS_MB):
+        # forkserver evita copiar o estado das threads do servidor para os processos filhos
+        start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        context = multiprocessing.get_context(start_method)
+        self.timeout = timeout
+        self.max_rss_bytes = max_rss_mb * 1024 * 1024
+        # O limite é aplicado dentro de cada processo; a verificação periódica em _call continua como reserva
+        self._workers = [_Worker(context, self.max_rss_bytes) for _ in range(max(1, num_workers))]
+        # Sessões com processo reservado (ver assign); as demais são distribuídas pelo hash do identificador
+        self._assigned = {}
+        self._assign_lock = threading.Lock()
+
+    def assign(self, session_id):
+        """Reserva para a sessão o processo com menos sessões reservadas; livre enquanto houver processos sobrando."""
+        with self._assign_lock:
+            if session_id not in self._assigned:
+                in_use = list(self._assigned.values())
+                self._assigned[session_id] = min(self._workers, key=in_use.count)
+
+    def release(self, session_id):
+        with self._assign_lock:
+            self._assigned.pop(session_id, None)
+
+    def _worker_for(self, session_id):
+        with self._assign_lock:
+            worker = self._assigned.get(session_id)
+        # A sessão sempre usa o mesmo processo, onde as suas variáveis continuam definidas
+        return worker or self._workers[hash(session_id) % len(self._workers)]
+
+    def run(self, session_id, dataset_hash, df, code, sample_spec=None):
+        """Executa o código no processo da sessão e retorna (saída, gráficos em bytes)."""
+        worker = self._worker_for(session_id)
+        # O processo pode estar ocupado com outra sessão: a espera também é limitada
+        if not worker.lock.acquire(timeout=self.timeout):
+            return f"RuntimeError: os processos de execução estão ocupados há mais de {self.timeout:.0f} segundos. Tente novamente em instantes.", []
+        try:
+            if not worker.process.is_alive():
+                worker.restart()
+            request = {"session": session_id, "dataset": dataset_hash, "code": code, "sample": sample_spec}
+            if dataset_hash not in worker.loaded_datasets and not dataset_store.has_dataset(dataset_hash):
+                request["df"] = df
+            reply = self._call(worker, request)
+            if reply.get("missing_dataset"):
+                reply = self._call(worker, dict(request, df=df))
+            worker.loaded_datasets.add(dataset_hash)
+        finally:
+            worker.lock.release()
+        return reply.get("output", ""), reply.get("images", [])
+
+    def _call(self, worker, request):
+        worker.wait_ready()
+        worker.conn.send(request)
+        deadline = time.monotonic() + self.timeout
+        try:
+            while not worker.conn.poll(0.1):
+                if time.monotonic() > deadline:
+                    worker.restart()
+                    return {"output": f"TimeoutError: a execução excedeu o limite de {self.timeout:.0f} segundos e foi cancelada. Tente uma abordagem mais eficiente."}
+                if _anonymous_rss(worker.process.pid) > self.max_rss_bytes:
+                    worker.restart()
+                    return {"output": f"MemoryError: a execução excedeu o limite de {self.max_rss_bytes // (1024 * 1024)} MB de memória e foi cancelada. Trabalhe com menos colunas ou agregue os dados antes."}
+                if not worker.process.is_alive():
+                    worker.restart()
+                    return {"output": "RuntimeError: o processo de execução foi encerrado inesperadamente."}
+            return worker.conn.recv()
+        except BaseException:
+            # Se a espera for interrompida, a execução em andamento é cancelada junto
+            worker.restart()
+            raise
+
+    def shutdown(self):
+        for worker in self._workers:
+            worker.process.kill()
+            worker.process.join()
+
+# --- Ferramenta do Agente ---
+class SandboxedPythonTool(BaseTool):
+    """Substituto do python_repl_ast que envia o código para o SandboxPool."""
+
+    name: str = "python_repl_ast"
+    description: str = ""
+    args_schema: Type[BaseModel] = PythonInputs
+    pool: Any = None
+    session_id: str = ""
+    dataset_hash: str = ""
+    df: Any = None
+    sample_spec: Any = None
+
+    def _run(self, query, run_manager=None):
+        output, images = self.pool.run(self.session_id, self.dataset_hash, self.df, query, self.sample_spec)
+        # Os gráficos gerados no processo entram na captura da execução atual do agente
+        for image_bytes in images:
+            plot_capture.record_captured_image(image_bytes)
+        return output
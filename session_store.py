@@ -0,0 +1,212 @@
+# --- Importações Essenciais ---
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+from collections import OrderedDict
+from collections.abc import Sequence
+import streamlit as st
+
+# Banco local (SQLite) onde as análises ficam gravadas entre logins e reinícios do servidor
+SESSION_STORE_PATH = os.getenv("EDA_SESSION_STORE_PATH", ".session_store.sqlite3")
+# Análises mantidas em memória (LRU) e tempo (em segundos) sem acesso até uma análise sair da memória
+SESSION_CACHE_MAX_SESSIONS = int(os.getenv("EDA_SESSION_CACHE_SESSIONS", "32"))
+SESSION_IDLE_S = int(os.getenv("EDA_SESSION_IDLE_S", "600"))
+# Registros a partir deste tamanho (em bytes) são gravados comprimidos
+COMPRESS_MIN_BYTES = 256
+# Análises listadas para serem retomadas
+RESUME_LIST_LIMIT = 20
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    title TEXT NOT NULL,
+    file_name TEXT,
+    dataset_hash TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_owner ON sessions (owner, updated_at);
+CREATE TABLE IF NOT EXISTS messages (
+    session_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    record BLOB NOT NULL,
+    figures TEXT NOT NULL,
+    PRIMARY KEY (session_id, seq)
+);
+CREATE TABLE IF NOT EXISTS figures (
+    id TEXT PRIMARY KEY,
+    data BLOB NOT NULL
+);
+"""
+
+# --- Registros Compactos ---
+def encode_message(message):
+    """Mensagem como JSON compacto, comprimido com zlib quando for grande."""
+    data = json.dumps(message, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    if len(data) >= COMPRESS_MIN_BYTES:
+        return b"z" + zlib.compress(data)
+    return b"j" + data
+
+def decode_message(record):
+    data = zlib.decompress(record[1:]) if record[:1] == b"z" else record[1:]
+    return json.loads(data)
+
+
+class StoredConversation(Sequence):
+    """Mensagens de uma análise guardadas como registros compactos; cada mensagem é decodificada só quando acessada."""
+
+    def __init__(self, records):
+        self._records = records
+
+    def __len__(self):
+        return len(self._records)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [decode_message(record) for record in self._records[index]]
+        return decode_message(self._records[index])
+
+# --- Armazenamento ---
+class SessionStore:
+    """Análises gravadas em SQLite (mensagens compactas e gráficos por hash), com as mais usadas mantidas em memória."""
+
+    def __init__(self, path=SESSION_STORE_PATH, max_sessions=SESSION_CACHE_MAX_SESSIONS, idle_s=SESSION_IDLE_S):
+        self.max_sessions = max_sessions
+        self.idle_s = idle_s
+        # Uma conexão compartilhada pelas threads das sessões; o acesso é serializado pelo lock
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+        self._hot = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _evict(self, now):
+        """Remove da memória as análises sem acesso recente e, acima do limite, as menos usadas (continuam no disco)."""
+        while self._hot:
+            session_id, (_, last_access) = next(iter(self._hot.items()))
+            if len(self._hot) <= self.max_sessions and now - last_access < self.idle_s:
+                break
+            del self._hot[session_id]
+
+    def _records(self, session_id):
+        now = time.monotonic()
+        entry = self._hot.get(session_id)
+        if entry is None:
+            rows = self._db.execute("SELECT record FROM messages WHERE session_id = ? ORDER BY seq", (session_id,))
+            entry = [[row[0] for row in rows], now]
+            self._hot[session_id] = entry
+        entry[1] = now
+        self._hot.move_to_end(session_id)
+        self._evict(now)
+        return entry[0]
+
+    def create(self, owner, title, file_name=None, dataset_hash=None):
+        """Registra uma nova análise e retorna o seu identificador."""
+        session_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT INTO sessions VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (session_id, owner, title, file_name, dataset_hash, now, now)
+            )
+        return session_id
+
+    def messages(self, session_id):
+        """Mensagens da análise, lidas do disco apenas quando ela não está em memória."""
+        with self._lock:
+            return StoredConversation(self._records(session_id))
+
+    def append(self, session_id, message, figure_store):
+        """Grava a mensagem e os seus gráficos (deduplicados pelo hash) e a acrescenta à análise em memória."""
+        record = encode_message(message)
+        figure_ids = message.get("images", [])
+        figures = [(figure_id, figure_store.get(figure_id)) for figure_id in figure_ids]
+        with self._lock, self._db:
+            records = self._records(session_id)
+            self._db.executemany(
+                "INSERT OR IGNORE INTO figures VALUES (?, ?)",
+                [(figure_id, data) for figure_id, data in figures if data is not None]
+            )
+            self._db.execute(
+                "INSERT INTO messages VALUES (?, ?, ?, ?)",
+                (session_id, len(records), record, json.dumps(figure_ids))
+            )
+            self._db.execute("UPDATE sessions SET updated_at = ? WHERE id = ?", (time.time(), session_id))
+            records.append(record)
+
+    def get_figure(self, figure_id):
+        with self._lock:
+            row = self._db.execute("SELECT data FROM figures WHERE id = ?", (figure_id,)).fetchone()
+        return row[0] if row else None
+
+    def get_session(self, session_id):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT id, title, file_name, dataset_hash, updated_at FROM sessions WHERE id = ?", (session_id,)
+            ).fetchone()
+        return dict(zip(("id", "title", "file_name", "dataset_hash", "updated_at"), row)) if row else None
+
+    def list_sessions(self, owner, limit=RESUME_LIST_LIMIT):
+        """Análises do usuário, da mais recente para a mais antiga, com a quantidade de mensagens."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT s.id, s.title, s.file_name, s.dataset_hash, s.updated_at, COUNT(m.seq) "
+                "FROM sessions s LEFT JOIN messages m ON m.session_id = s.id "
+                "WHERE s.owner = ? GROUP BY s.id ORDER BY s.updated_at DESC LIMIT ?",
+                (owner, limit)
+            ).fetchall()
+        return [dict(zip(("id", "title", "file_name", "dataset_hash", "updated_at", "messages"), row)) for row in rows]
+
+    def delete(self, session_id):
+        """Remove a análise e os gráficos que nenhuma outra análise usa."""
+        with self._lock, self._db:
+            self._hot.pop(session_id, None)
+            self._db.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+            self._db.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+            self._db.execute(
+                "DELETE FROM figures WHERE id NOT IN (SELECT value FROM messages, json_each(messages.figures))"
+            )
+
+
+@st.cache_resource
+def get_session_store():
+    """Instância única do armazenamento de análises, compartilhada por todas as sessões do servidor."""
+    return SessionStore()
+
+# --- Análise da Sessão Atual ---
+def session_owner():
+    """Dono das análises: o hash da chave de API da sessão (a chave em si não é gravada)."""
+    return hashlib.blake2b(st.session_state["api_key"].encode(), digest_size=16).hexdigest()
+
+def get_session_messages():
+    """Mensagens da análise atual da sessão; vazia enquanto nada foi perguntado."""
+    session_id = st.session_state.get("stored_session_id")
+    return get_session_store().messages(session_id) if session_id else StoredConversation([])
+
+def append_session_message(message, figure_store):
+    """Grava a mensagem na análise atual, criando a análise na primeira mensagem."""
+    store = get_session_store()
+    session_id = st.session_state.get("stored_session_id")
+    if session_id is None:
+        session_id = st.session_state.stored_session_id = store.create(
+            session_owner(),
+            title=message["content"][:80],
+            file_name=st.session_state.get("current_file"),
+            dataset_hash=st.session_state.get("dataset_hash")
+        )
+    store.append(session_id, message, figure_store)
+
+def start_new_session():
+    """A próxima mensagem abre uma nova análise; a atual continua gravada e pode ser retomada."""
+    st.session_state.pop("stored_session_id", None)
+
+def resume_session(session_id):
+    """Torna a análise gravada a análise atual da sessão e retorna os seus metadados."""
+    st.session_state.stored_session_id = session_id
+    return get_session_store().get_session(session_id)
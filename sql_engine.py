@@ -0,0 +1,108 @@
+# --- Importações Essenciais ---
+import os
+import threading
+from collections import OrderedDict
+import streamlit as st
+from langchain_core.tools import Tool
+import dataset_store
+
+# DuckDB é opcional: sem ele o agente continua apenas com a ferramenta Python
+try:
+    import duckdb
+    DUCKDB_AVAILABLE = True
+except ImportError:
+    duckdb = None
+    DUCKDB_AVAILABLE = False
+
+# Memória máxima do motor SQL; acima dela as operações são despejadas em disco
+SQL_MEMORY_LIMIT = os.getenv("EDA_SQL_MEMORY_LIMIT", "4GB")
+SQL_THREADS = int(os.getenv("EDA_SQL_THREADS", str(os.cpu_count() or 1)))
+SQL_TEMP_DIR = os.getenv("EDA_SQL_TEMP_DIR", ".duckdb_tmp")
+# Tempo máximo (em segundos) de cada consulta e linhas devolvidas ao agente
+SQL_TIMEOUT_S = float(os.getenv("EDA_SQL_TIMEOUT_S", "60"))
+SQL_MAX_ROWS = int(os.getenv("EDA_SQL_MAX_ROWS", "200"))
+# Quantos datasets ficam registrados (abertos via memory-map) no motor
+SQL_MAX_TABLES = 4
+TABLE_NAME = "dados"
+
+# --- Motor SQL ---
+class SQLEngine:
+    """Banco DuckDB em memória, compartilhado pelo processo, que consulta os datasets sem copiá-los para o pandas."""
+
+    def __init__(self, memory_limit=SQL_MEMORY_LIMIT, threads=SQL_THREADS, temp_dir=SQL_TEMP_DIR, timeout=SQL_TIMEOUT_S):
+        os.makedirs(temp_dir, exist_ok=True)
+        self.timeout = timeout
+        self.con = duckdb.connect(config={"memory_limit": memory_limit, "threads": threads, "temp_directory": temp_dir})
+        # As consultas vêm do agente: sem acesso a arquivos e sem permissão para alterar a configuração
+        self.con.execute("SET enable_external_access = false")
+        self.con.execute("SET lock_configuration = true")
+        self._tables = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _table(self, dataset_hash, df):
+        """Cópia colunar do dataset (Arrow via memory-map) ou, sem ela, o próprio DataFrame."""
+        with self._lock:
+            if dataset_hash not in self._tables:
+                if dataset_store.has_dataset(dataset_hash):
+                    self._tables[dataset_hash] = dataset_store.load_arrow_table(dataset_hash)
+                else:
+                    self._tables[dataset_hash] = df
+                while len(self._tables) > SQL_MAX_TABLES:
+                    self._tables.popitem(last=False)
+            self._tables.move_to_end(dataset_hash)
+            return self._tables[dataset_hash]
+
+    def query(self, dataset_hash, df, sql, max_rows=SQL_MAX_ROWS):
+        """Executa a consulta sobre a tabela `dados` e retorna (DataFrame com até max_rows linhas, se houve corte)."""
+        cursor = self.con.cursor()
+        # O cancelamento por tempo interrompe só esta consulta
+        timer = threading.Timer(self.timeout, cursor.interrupt)
+        timer.start()
+        try:
+            cursor.register(TABLE_NAME, self._table(dataset_hash, df))
+            result = cursor.sql(sql)
+            if result is None:
+                return None, False
+            rows = result.limit(max_rows + 1).df()
+        finally:
+            timer.cancel()
+            cursor.close()
+        return rows.head(max_rows), len(rows) > max_rows
+
+
+@st.cache_resource
+def get_sql_engine():
+    """Instância única do motor SQL, compartilhada por todas as sessões do servidor."""
+    return SQLEngine()
+
+# --- Ferramenta do Agente ---
+def make_sql_tool(dataset_hash, df):
+    """Ferramenta que executa SQL (DuckDB) sobre o dataset completo, com execução paralela e uso de disco."""
+    def run(sql):
+        sql = sql.strip().strip("`")
+        if sql.lower().startswith("sql"):
+            sql = sql[3:]
+        engine = get_sql_engine()
+        try:
+            rows, truncated = engine.query(dataset_hash, df, sql)
+        except duckdb.InterruptException:
+            return f"TimeoutError: a consulta excedeu o limite de {engine.timeout:.0f} segundos e foi cancelada."
+        except duckdb.Error as e:
+            return f"{type(e).__name__}: {e}"
+        if rows is None:
+            return "Consulta executada sem resultado."
+        output = rows.to_string(index=False)
+        if truncated:
+            output += f"\n[... resultado cortado em {SQL_MAX_ROWS} linhas; agregue ou use LIMIT]"
+        return output
+
+    return Tool(
+        name="sql_query",
+        func=run,
+        description=(
+            f"Executa uma consulta SQL (dialeto DuckDB) sobre a tabela `{TABLE_NAME}`, que contém todas as linhas do dataset. "
+            "Multi-thread e sem carregar os dados no pandas: prefira esta ferramenta para contagens, somas, médias, "
+            "group by, filtros e ordenações. "
+            f"Retorna no máximo {SQL_MAX_ROWS} linhas. Input: uma única consulta SQL."
+        )
+    )
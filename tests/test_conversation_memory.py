@@ -0,0 +1,81 @@
+from types import SimpleNamespace
+from conversation_memory import ConversationMemory, estimate_tokens, format_message
+
+class FakeLLM:
+    """Registra os prompts de resumo e devolve um resumo numerado."""
+
+    def __init__(self, fail=False):
+        self.prompts = []
+        self.fail = fail
+
+    def invoke(self, prompt):
+        self.prompts.append(prompt)
+        if self.fail:
+            raise RuntimeError("modelo indisponível")
+        return SimpleNamespace(content=f"resumo {len(self.prompts)}")
+
+def _messages(n, size=80):
+    return [{"role": "user" if i % 2 == 0 else "assistant", "content": f"mensagem {i} " + "x" * size} for i in range(n)]
+
+def test_dentro_do_orcamento_nao_resume():
+    llm = FakeLLM()
+    memory = ConversationMemory(token_budget=1000)
+    messages = _messages(4)
+    context = memory.build_context(messages, llm)
+    assert llm.prompts == []
+    assert context == "\n".join(format_message(m) for m in messages)
+
+def test_resume_ao_estourar_o_orcamento():
+    llm = FakeLLM()
+    budget = 100
+    memory = ConversationMemory(token_budget=budget)
+    messages = _messages(10)
+    context = memory.build_context(messages, llm)
+    assert len(llm.prompts) == 1
+    assert context.startswith("Resumo dos turnos anteriores: resumo 1")
+    # Os turnos recentes cabem em metade do orçamento; os anteriores foram para o resumo
+    recent = messages[memory.summarized_count:]
+    assert sum(estimate_tokens(format_message(m)) for m in recent) <= budget // 2
+    assert "mensagem 0 " in llm.prompts[0]
+    assert "mensagem 0 " not in context
+
+def test_resumo_incremental():
+    llm = FakeLLM()
+    memory = ConversationMemory(token_budget=100)
+    messages = _messages(10)
+    memory.build_context(messages, llm)
+    summarized = memory.summarized_count
+    # Um turno a mais ainda cabe na folga deixada pelo resumo
+    memory.build_context(messages + _messages(1), llm)
+    assert len(llm.prompts) == 1
+    messages += _messages(6)
+    memory.build_context(messages, llm)
+    assert len(llm.prompts) == 2
+    # O novo resumo parte do anterior e recebe apenas os turnos ainda não resumidos
+    assert "resumo 1" in llm.prompts[1]
+    assert f"mensagem {summarized - 1} " not in llm.prompts[1].split("Novos turnos:")[1]
+    assert memory.summarized_count > summarized
+
+def test_falha_no_resumo_tenta_de_novo_no_proximo_turno():
+    memory = ConversationMemory(token_budget=100)
+    messages = _messages(10)
+    context = memory.build_context(messages, FakeLLM(fail=True))
+    assert memory.summary == ""
+    assert memory.summarized_count == 0
+    assert "Resumo" not in context
+    llm = FakeLLM()
+    memory.build_context(messages, llm)
+    assert len(llm.prompts) == 1
+    assert memory.summary == "resumo 1"
+
+def test_historico_menor_reinicia_o_resumo():
+    memory = ConversationMemory(token_budget=100)
+    memory.build_context(_messages(10), FakeLLM())
+    context = memory.build_context(_messages(2), FakeLLM())
+    assert memory.summary == ""
+    assert "Resumo" not in context
+
+def test_mensagens_longas_sao_truncadas():
+    line = format_message({"role": "assistant", "content": "y" * 5000})
+    assert line.endswith(" [...]")
+    assert len(line) < 2100
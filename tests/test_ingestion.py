@@ -0,0 +1,29 @@
+import io
+import numpy as np
+import pandas as pd
+from ingestion import read_csv_optimized
+
+def _csv(df):
+    return io.BytesIO(df.to_csv(index=False).encode())
+
+def test_bloco_final_curto_mantem_categoria():
+    # 3 linhas a mais que o tamanho do bloco: o último bloco tem 3 valores distintos em 3 linhas
+    rows = 23
+    df = pd.DataFrame({"cor": [f"cor{i % 5}" for i in range(rows)], "valor": np.arange(rows)})
+    loaded, _ = read_csv_optimized(_csv(df), chunk_rows=20)
+    assert isinstance(loaded["cor"].dtype, pd.CategoricalDtype)
+    assert loaded["cor"].astype(str).tolist() == df["cor"].tolist()
+
+def test_bloco_sem_valores_mantem_categoria():
+    cor = ["a", "b"] * 10 + [None] * 20
+    df = pd.DataFrame({"cor": cor, "valor": np.arange(len(cor))})
+    loaded, _ = read_csv_optimized(_csv(df), chunk_rows=20)
+    assert isinstance(loaded["cor"].dtype, pd.CategoricalDtype)
+    assert loaded["cor"].isna().sum() == 20
+    assert loaded["cor"].dropna().astype(str).tolist() == cor[:20]
+
+def test_alta_cardinalidade_volta_para_texto():
+    df = pd.DataFrame({"id": [f"id{i}" for i in range(50)]})
+    loaded, _ = read_csv_optimized(_csv(df), chunk_rows=20)
+    assert not isinstance(loaded["id"].dtype, pd.CategoricalDtype)
+    assert loaded["id"].tolist() == df["id"].tolist()
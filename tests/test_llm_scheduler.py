@@ -0,0 +1,162 @@
+import threading
+import time
+import pytest
+from google.genai import errors
+import llm_scheduler
+from llm_scheduler import LLMScheduler, PRIORITY_BACKGROUND, is_transient, llm_priority, retry_delay
+
+def _api_error(code):
+    return errors.ClientError(code, {"error": {"code": code, "message": "erro", "status": "ERRO"}})
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(llm_scheduler, "retry_delay", lambda error, attempt: 0)
+
+class Flaky:
+    """Falha `failures` vezes com o erro dado e depois responde."""
+
+    def __init__(self, error, failures):
+        self.error = error
+        self.failures = failures
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.error
+        return "ok"
+
+def test_repete_erros_transitorios():
+    scheduler = LLMScheduler(max_retries=3)
+    fn = Flaky(_api_error(429), failures=2)
+    assert scheduler.call("chave", 10, fn) == "ok"
+    assert fn.calls == 3
+    assert scheduler.metrics()["retries"] == 2
+
+def test_nao_repete_erros_definitivos():
+    scheduler = LLMScheduler(max_retries=3)
+    fn = Flaky(_api_error(400), failures=1)
+    with pytest.raises(errors.ClientError):
+        scheduler.call("chave", 10, fn)
+    assert fn.calls == 1
+    assert scheduler.metrics()["failures"] == 1
+
+def test_desiste_depois_do_limite_de_tentativas():
+    scheduler = LLMScheduler(max_retries=2)
+    fn = Flaky(_api_error(503), failures=10)
+    with pytest.raises(errors.APIError):
+        scheduler.call("chave", 10, fn)
+    assert fn.calls == 3
+    # A vaga de cada tentativa é liberada
+    assert scheduler.metrics()["active"] == 0
+
+def test_classificacao_e_espera():
+    assert is_transient(_api_error(429))
+    assert is_transient(RuntimeError("falha")) is False
+    wrapped = RuntimeError("embrulhado")
+    wrapped.__cause__ = ConnectionError()
+    assert is_transient(wrapped)
+    assert 0 <= retry_delay(_api_error(500), 3) <= 8
+    assert 7 <= retry_delay(Exception("'retryDelay': '7s'"), 0) <= 8
+
+def test_limite_de_chamadas_simultaneas():
+    scheduler = LLMScheduler(max_concurrency=2)
+    lock = threading.Lock()
+    state = {"active": 0, "max": 0}
+
+    def fn():
+        with lock:
+            state["active"] += 1
+            state["max"] = max(state["max"], state["active"])
+        time.sleep(0.1)
+        with lock:
+            state["active"] -= 1
+        return "ok"
+
+    threads = [threading.Thread(target=scheduler.call, args=("chave", 10, fn)) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert state["max"] == 2
+    assert scheduler.metrics()["requests"] == 6
+
+def test_orcamento_de_requisicoes_por_minuto(monkeypatch):
+    monkeypatch.setattr(llm_scheduler, "WINDOW_S", 0.5)
+    scheduler = LLMScheduler(requests_per_minute=2)
+    start = time.monotonic()
+    for _ in range(3):
+        scheduler.call("chave", 10, lambda: "ok")
+    # A terceira chamada espera a primeira sair da janela
+    assert time.monotonic() - start >= 0.45
+    # Outra chave tem o seu próprio orçamento
+    start = time.monotonic()
+    scheduler.call("outra", 10, lambda: "ok")
+    assert time.monotonic() - start < 0.2
+
+def test_orcamento_de_tokens_usa_o_consumo_real(monkeypatch):
+    monkeypatch.setattr(llm_scheduler, "WINDOW_S", 0.5)
+    scheduler = LLMScheduler(tokens_per_minute=100)
+    # A estimativa (90) é corrigida pelo consumo real (10): a próxima chamada cabe na janela
+    scheduler.call("chave", 90, lambda: "ok", count_tokens=lambda result: 10)
+    start = time.monotonic()
+    scheduler.call("chave", 80, lambda: "ok")
+    assert time.monotonic() - start < 0.2
+    assert scheduler.metrics()["window_tokens"] == 90
+
+def test_streaming_repete_antes_do_primeiro_trecho():
+    scheduler = LLMScheduler(max_retries=3)
+    calls = []
+
+    def fn():
+        calls.append(1)
+        if len(calls) == 1:
+            raise _api_error(429)
+        yield "a"
+        yield "b"
+
+    assert list(scheduler.stream("chave", 10, fn)) == ["a", "b"]
+    assert len(calls) == 2
+
+def test_streaming_nao_repete_depois_do_primeiro_trecho():
+    scheduler = LLMScheduler(max_retries=3)
+    calls = []
+
+    def fn():
+        calls.append(1)
+        yield "a"
+        raise _api_error(429)
+
+    received = []
+    with pytest.raises(errors.ClientError):
+        for chunk in scheduler.stream("chave", 10, fn):
+            received.append(chunk)
+    assert received == ["a"]
+    assert len(calls) == 1
+    assert scheduler.metrics()["active"] == 0
+
+def test_prioridade_interativa_passa_na_frente():
+    scheduler = LLMScheduler(max_concurrency=1)
+    order = []
+    gate = threading.Event()
+    first = threading.Thread(target=scheduler.call, args=("chave", 10, gate.wait))
+    first.start()
+    time.sleep(0.05)
+
+    def queued(name, priority=None):
+        if priority is None:
+            scheduler.call("chave", 10, lambda: order.append(name))
+        else:
+            with llm_priority(priority):
+                scheduler.call("chave", 10, lambda: order.append(name))
+
+    background = threading.Thread(target=queued, args=("segundo plano", PRIORITY_BACKGROUND))
+    background.start()
+    time.sleep(0.05)
+    interactive = threading.Thread(target=queued, args=("interativa",))
+    interactive.start()
+    time.sleep(0.05)
+    gate.set()
+    for thread in (first, background, interactive):
+        thread.join()
+    assert order == ["interativa", "segundo plano"]
@@ -0,0 +1,26 @@
+import numpy as np
+import pandas as pd
+from profiling import compute_profile, format_profile_for_prompt
+
+def test_perfil_com_tipos_mistos():
+    df = pd.DataFrame({
+        "valor": [1.5, 2.5, np.nan, 4.0, 5.0],
+        "quantidade": np.arange(5, dtype="int16"),
+        "categoria": pd.Series(list("aabbc"), dtype="category"),
+        "texto": list("vwxyz"),
+        "ativo": [True, False, True, True, False],
+        "data": pd.date_range("2024-01-01", periods=5),
+        "duracao": pd.to_timedelta(np.arange(5), unit="s"),
+    })
+    profile = compute_profile(df)
+    columns = profile["columns"]
+    assert profile["rows"] == 5
+    assert columns["valor"]["stats"]["max"] == 5.0
+    assert columns["valor"]["nulls"] == 1
+    assert "stats" in columns["quantidade"]
+    for name in ("categoria", "texto", "ativo", "data", "duracao"):
+        assert "stats" not in columns[name]
+        assert "top_values" in columns[name]
+    assert columns["categoria"]["top_values"] == {"a": 2, "b": 2, "c": 1}
+    assert [(a, b) for a, b, _ in profile["top_correlations"]] == [("valor", "quantidade")]
+    assert "duracao" in format_profile_for_prompt(profile)
@@ -0,0 +1,70 @@
+from query_cache import QueryCache, normalize_prompt, query_scope
+
+def _result(content):
+    return {"content": content, "thoughts": [], "figures": []}
+
+def test_continuacao_nao_e_servida_em_outra_conversa():
+    cache = QueryCache()
+    followup = normalize_prompt("E para a coluna Y?")
+    history_a = [{"role": "user", "content": "Média da coluna preço"}, {"role": "assistant", "content": "A média é 10."}]
+    history_b = [{"role": "user", "content": "Histograma da idade"}, {"role": "assistant", "content": "Segue o gráfico."}]
+    cache.put(query_scope("d", history=history_a), "m", followup, _result("média de Y"))
+    assert cache.get(query_scope("d", history=history_b), "m", followup) is None
+    assert cache.get(query_scope("d"), "m", followup) is None
+    assert cache.get(query_scope("d", history=list(history_a)), "m", followup)["content"] == "média de Y"
+
+def test_primeira_pergunta_e_compartilhada_entre_conversas():
+    cache = QueryCache()
+    cache.put(query_scope("d"), "m", "quantas linhas", _result("100"))
+    assert cache.get(query_scope("d", history=[]), "m", "quantas linhas")["content"] == "100"
+    assert cache.get(query_scope("d", ("random", 10, None)), "m", "quantas linhas") is None
+
+def test_normalizacao_da_pergunta():
+    assert normalize_prompt("  Qual é a MÉDIA,   por região? ") == "qual e a media por regiao"
+
+def test_respostas_expiram(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("query_cache.time.time", lambda: now[0])
+    cache = QueryCache(ttl_seconds=60)
+    cache.put("d", "m", "p", _result("resposta"))
+    now[0] += 59
+    assert cache.get("d", "m", "p")["content"] == "resposta"
+    now[0] += 2
+    assert cache.get("d", "m", "p") is None
+    assert cache.current_bytes == 0
+
+def test_limite_de_memoria_remove_as_menos_usadas():
+    figure = ("f", b"x" * 400)
+    cache = QueryCache(max_bytes=1000)
+    for prompt in ("a", "b"):
+        cache.put("d", "m", prompt, {"content": prompt, "thoughts": [], "figures": [figure]})
+    cache.get("d", "m", "a")
+    cache.put("d", "m", "c", {"content": "c", "thoughts": [], "figures": [figure]})
+    # "b" era a menos usada
+    assert cache.get("d", "m", "b") is None
+    assert cache.get("d", "m", "a") is not None
+    assert cache.get("d", "m", "c")["figures"] == [figure]
+    assert cache.current_bytes <= 1000
+
+def test_resposta_maior_que_o_limite_nao_e_armazenada():
+    cache = QueryCache(max_bytes=100)
+    cache.put("d", "m", "a", _result("curta"))
+    cache.put("d", "m", "b", {"content": "", "thoughts": [], "figures": [("f", b"x" * 200)]})
+    assert cache.get("d", "m", "b") is None
+    assert cache.get("d", "m", "a") is not None
+
+def test_limite_de_quantidade():
+    cache = QueryCache(max_entries=2)
+    for prompt in ("a", "b", "c"):
+        cache.put("d", "m", prompt, _result(prompt))
+    assert cache.get("d", "m", "a") is None
+    assert len(cache._entries) == 2
+
+def test_busca_por_similaridade_respeita_o_limite():
+    cache = QueryCache(similarity_threshold=0.95)
+    cache.put("d", "m", "media de preco", _result("média"), embedding=[1.0, 0.0, 0.0])
+    assert cache.get_similar("d", "m", [0.99, 0.05, 0.0])["content"] == "média"
+    assert cache.get_similar("d", "m", [0.7, 0.7, 0.0]) is None
+    # Outro dataset ou outro modelo não compartilham respostas
+    assert cache.get_similar("outro", "m", [1.0, 0.0, 0.0]) is None
+    assert cache.get_similar("d", "outro", [1.0, 0.0, 0.0]) is None
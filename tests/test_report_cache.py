@@ -0,0 +1,87 @@
+from types import SimpleNamespace
+from conversation_memory import ConversationMemory
+from figure_store import FigureStore
+from report_cache import ReportCache, message_digest
+from utils import export_chat_report
+
+class FakeLLM:
+    def __init__(self):
+        self.prompts = []
+
+    def invoke(self, prompt):
+        self.prompts.append(prompt)
+        return SimpleNamespace(content=f"sumário {len(self.prompts)}")
+
+def _conversation(n):
+    messages = []
+    for i in range(n):
+        messages += [{"role": "user", "content": f"pergunta {i}"}, {"role": "assistant", "content": f"resposta {i}"}]
+    return messages
+
+def _summary(cache, messages, llm):
+    return cache.executive_summary(messages, [message_digest(m) for m in messages], llm, ConversationMemory())
+
+def test_digest_muda_com_texto_e_graficos():
+    message = {"role": "assistant", "content": "resposta"}
+    assert message_digest(message) == message_digest(dict(message))
+    assert message_digest(message) != message_digest(dict(message, content="outra"))
+    assert message_digest(message) != message_digest(dict(message, images=["f1"]))
+    assert message_digest(message) != message_digest(dict(message, role="user"))
+
+def test_sumario_inalterado_nao_chama_o_modelo():
+    llm, cache = FakeLLM(), ReportCache()
+    messages = _conversation(2)
+    assert _summary(cache, messages, llm) == "sumário 1"
+    assert _summary(cache, list(messages), llm) == "sumário 1"
+    assert len(llm.prompts) == 1
+
+def test_conversa_que_cresceu_envia_so_os_turnos_novos():
+    llm, cache = FakeLLM(), ReportCache()
+    messages = _conversation(2)
+    _summary(cache, messages, llm)
+    messages += _conversation(3)[4:]
+    assert _summary(cache, messages, llm) == "sumário 2"
+    prompt = llm.prompts[1]
+    assert "sumário 1" in prompt
+    assert "pergunta 2" in prompt
+    assert "pergunta 0" not in prompt
+
+def test_conversa_alterada_refaz_o_sumario():
+    llm, cache = FakeLLM(), ReportCache()
+    messages = _conversation(2)
+    _summary(cache, messages, llm)
+    # Uma mensagem anterior mudou (ex.: chat reiniciado): o sumário é refeito a partir do histórico completo
+    messages[1] = {"role": "assistant", "content": "resposta corrigida"}
+    _summary(cache, messages, llm)
+    prompt = llm.prompts[1]
+    assert "sumário 1" not in prompt
+    assert "resposta corrigida" in prompt
+
+def test_blocos_construidos_uma_vez_e_descartados():
+    cache = ReportCache()
+    builds = []
+    build = lambda: builds.append(1) or {"text": "bloco"}
+    assert cache.get_block("a", build) == {"text": "bloco"}
+    cache.get_block("a", build)
+    cache.get_block("b", build)
+    assert len(builds) == 2
+    cache.prune_blocks(["b"])
+    assert list(cache.blocks) == ["b"]
+
+def test_arquivo_reaproveitado_ate_a_conversa_mudar():
+    llm, cache, memory = FakeLLM(), ReportCache(), ConversationMemory()
+    figure_store = FigureStore(1024 * 1024)
+    messages = _conversation(2)
+    first = export_chat_report(messages, "autor", llm, figure_store, memory, cache, report_format="md")
+    again = export_chat_report(list(messages), "autor", llm, figure_store, memory, cache, report_format="md")
+    assert again is first
+    assert len(llm.prompts) == 1
+    blocks = dict(cache.blocks)
+    messages += _conversation(3)[4:]
+    updated = export_chat_report(messages, "autor", llm, figure_store, memory, cache, report_format="md")
+    assert updated is not first
+    assert b"pergunta 2" in updated
+    assert b"sum\xc3\xa1rio 2" in updated
+    # Os blocos das mensagens anteriores são reaproveitados
+    assert len(cache.blocks) == len(messages)
+    assert all(cache.blocks[digest] is block for digest, block in blocks.items())
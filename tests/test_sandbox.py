@@ -0,0 +1,49 @@
+import time
+import pandas as pd
+import pytest
+from sandbox import SandboxPool
+
+@pytest.fixture(scope="module")
+def pool():
+    pool = SandboxPool(num_workers=1, timeout=5, max_rss_mb=256)
+    yield pool
+    pool.shutdown()
+
+@pytest.fixture
+def df():
+    return pd.DataFrame({"a": [1, 2, 3]})
+
+def test_variaveis_persistem_na_sessao(pool, df):
+    pool.run("s1", "teste-sandbox", df, "total = df['a'].sum()")
+    output, images = pool.run("s1", "teste-sandbox", df, "total * 2")
+    assert output == "12"
+    assert images == []
+
+def test_alocacao_acima_do_limite_falha_no_processo(pool, df):
+    start = time.monotonic()
+    output, _ = pool.run("s1", "teste-sandbox", df, "import numpy as np\nnp.ones(2 * 1024 ** 3 // 8)")
+    assert output.startswith("MemoryError")
+    # O limite rígido falha na própria alocação, antes do tempo máximo da execução
+    assert time.monotonic() - start < 5
+    # O processo não precisou ser reiniciado: as variáveis da sessão continuam definidas
+    assert pool.run("s1", "teste-sandbox", df, "total")[0] == "6"
+
+def test_tempo_limite_cancela_execucao(pool, df):
+    output, _ = pool.run("s2", "teste-sandbox", df, "import time\ntime.sleep(30)")
+    assert output.startswith("TimeoutError")
+    assert pool.run("s2", "teste-sandbox", df, "len(df)")[0] == "3"
+
+def test_espera_por_processo_ocupado_e_limitada(df):
+    pool = SandboxPool(num_workers=1, timeout=0.5)
+    worker = pool._workers[0]
+    try:
+        # Outra sessão ocupando o processo
+        worker.lock.acquire()
+        start = time.monotonic()
+        output, images = pool.run("s2", "teste-sandbox", df, "len(df)")
+        assert "ocupados" in output
+        assert images == []
+        assert time.monotonic() - start < 2
+    finally:
+        worker.lock.release()
+        pool.shutdown()
@@ -0,0 +1,78 @@
+import pytest
+from session_store import SessionStore, decode_message, encode_message
+
+class FakeFigureStore:
+    def __init__(self, figures):
+        self.figures = figures
+
+    def get(self, figure_id):
+        return self.figures.get(figure_id)
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "analises.sqlite3")
+
+def test_registros_compactos():
+    short = {"role": "user", "content": "oi"}
+    long = {"role": "assistant", "content": "média " * 200}
+    assert encode_message(short)[:1] == b"j"
+    assert encode_message(long)[:1] == b"z"
+    assert len(encode_message(long)) < len("média " * 200)
+    for message in (short, long):
+        assert decode_message(encode_message(message)) == message
+
+def test_gravacao_e_leitura_entre_instancias(path):
+    figures = FakeFigureStore({"f1": b"grafico"})
+    store = SessionStore(path)
+    session_id = store.create("dono", "primeira pergunta", file_name="dados.csv", dataset_hash="h1")
+    store.append(session_id, {"role": "user", "content": "primeira pergunta"}, figures)
+    store.append(session_id, {"role": "assistant", "content": "resposta", "images": ["f1"]}, figures)
+
+    # Um novo processo (ou a análise fora da memória) lê tudo do disco
+    reopened = SessionStore(path)
+    messages = reopened.messages(session_id)
+    assert len(messages) == 2
+    assert messages[1] == {"role": "assistant", "content": "resposta", "images": ["f1"]}
+    assert messages[:1] == [{"role": "user", "content": "primeira pergunta"}]
+    assert reopened.get_figure("f1") == b"grafico"
+    meta = reopened.get_session(session_id)
+    assert (meta["title"], meta["file_name"], meta["dataset_hash"]) == ("primeira pergunta", "dados.csv", "h1")
+
+def test_lista_por_dono_da_mais_recente(path):
+    store = SessionStore(path)
+    figures = FakeFigureStore({})
+    first = store.create("dono", "a")
+    second = store.create("dono", "b")
+    store.create("outro", "c")
+    store.append(first, {"role": "user", "content": "a"}, figures)
+    sessions = store.list_sessions("dono")
+    assert [s["id"] for s in sessions] == [first, second]
+    assert [s["messages"] for s in sessions] == [1, 0]
+
+def test_analises_saem_da_memoria_sem_perder_dados(path):
+    store = SessionStore(path, max_sessions=1)
+    figures = FakeFigureStore({})
+    ids = [store.create("dono", str(i)) for i in range(3)]
+    for i, session_id in enumerate(ids):
+        store.append(session_id, {"role": "user", "content": str(i)}, figures)
+    assert list(store._hot) == [ids[-1]]
+    assert store.messages(ids[0])[0]["content"] == "0"
+
+def test_exclusao_remove_graficos_orfaos(path):
+    store = SessionStore(path)
+    figures = FakeFigureStore({"so_a": b"a", "compartilhado": b"c"})
+    a = store.create("dono", "a")
+    b = store.create("dono", "b")
+    store.append(a, {"role": "assistant", "content": "a", "images": ["so_a", "compartilhado"]}, figures)
+    store.append(b, {"role": "assistant", "content": "b", "images": ["compartilhado"]}, figures)
+
+    store.delete(a)
+    assert store.get_session(a) is None
+    assert len(store.messages(a)) == 0
+    assert [s["id"] for s in store.list_sessions("dono")] == [b]
+    assert store.get_figure("so_a") is None
+    assert store.get_figure("compartilhado") == b"c"
+
+    store.delete(b)
+    assert store.get_figure("compartilhado") is None
+    assert SessionStore(path).list_sessions("dono") == []
@@ -0,0 +1,193 @@
+# --- Importações Essenciais ---
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from langchain_core.callbacks import BaseCallbackHandler
+
+# Diretório onde os traces são gravados em JSON (formato OTLP); vazio desativa a exportação
+TRACE_EXPORT_DIR = os.getenv("EDA_TRACE_EXPORT_DIR", "")
+SERVICE_NAME = "first-class-agent-eda"
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+def _rss_bytes():
+    """Memória residente do processo (Linux); 0 onde /proc não está disponível."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return 0
+
+# --- Trace ---
+class Trace:
+    """Spans de uma execução (um turno do chat, um relatório): duração, tokens e variação de memória."""
+
+    def __init__(self, name):
+        self.name = name
+        self.trace_id = os.urandom(16).hex()
+        self.spans = []
+        self._lock = threading.Lock()
+        self.root = self.start_span(name, parent_id=None)
+
+    def start_span(self, name, parent_id=None, attributes=None):
+        span = {
+            "span_id": os.urandom(8).hex(),
+            "parent_id": parent_id,
+            "name": name,
+            "start_wall_ns": time.time_ns(),
+            "start_ns": time.perf_counter_ns(),
+            "end_ns": None,
+            "rss_start": _rss_bytes(),
+            "attributes": dict(attributes or {}),
+        }
+        with self._lock:
+            self.spans.append(span)
+        return span
+
+    def end_span(self, span, **attributes):
+        span["attributes"].update(attributes)
+        span["end_ns"] = time.perf_counter_ns()
+        span["attributes"]["memory.delta_bytes"] = _rss_bytes() - span["rss_start"]
+
+    def finish(self):
+        if self.root["end_ns"] is None:
+            self.end_span(self.root)
+
+    def summary(self):
+        """Linhas do detalhamento (em ordem de início, com a profundidade de cada span) para exibição."""
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s["start_ns"])
+        depth = {}
+        rows = []
+        for span in spans:
+            depth[span["span_id"]] = depth.get(span["parent_id"], -1) + 1
+            end_ns = span["end_ns"] or time.perf_counter_ns()
+            attributes = span["attributes"]
+            rows.append({
+                "depth": depth[span["span_id"]],
+                "name": span["name"],
+                "duration_ms": round((end_ns - span["start_ns"]) / 1e6, 1),
+                "tokens": attributes.get("llm.total_tokens"),
+                "memory_delta_bytes": attributes.get("memory.delta_bytes", 0),
+            })
+        return rows
+
+    def to_otlp(self):
+        """Trace no formato JSON do OTLP, legível por coletores e ferramentas do OpenTelemetry."""
+        def value(v):
+            if isinstance(v, bool):
+                return {"boolValue": v}
+            if isinstance(v, int):
+                return {"intValue": str(v)}
+            if isinstance(v, float):
+                return {"doubleValue": v}
+            return {"stringValue": str(v)}
+
+        spans = []
+        for span in self.spans:
+            end_ns = span["end_ns"] or time.perf_counter_ns()
+            spans.append({
+                "traceId": self.trace_id,
+                "spanId": span["span_id"],
+                "parentSpanId": span["parent_id"] or "",
+                "name": span["name"],
+                "kind": 1,
+                "startTimeUnixNano": str(span["start_wall_ns"]),
+                "endTimeUnixNano": str(span["start_wall_ns"] + end_ns - span["start_ns"]),
+                "attributes": [{"key": k, "value": value(v)} for k, v in span["attributes"].items() if v is not None],
+            })
+        return {"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+            "scopeSpans": [{"scope": {"name": "eda.tracing"}, "spans": spans}],
+        }]}
+
+
+def start_trace(name):
+    """Inicia um trace e o torna o atual na thread; os spans abertos em seguida são registrados nele."""
+    trace = Trace(name)
+    _current_trace.set(trace)
+    _current_span.set(trace.root["span_id"])
+    return trace
+
+@contextmanager
+def span(name, **attributes):
+    """Mede o bloco como um span do trace atual (sem efeito quando não há trace ativo)."""
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+    current = trace.start_span(name, parent_id=_current_span.get(), attributes=attributes)
+    token = _current_span.set(current["span_id"])
+    try:
+        yield current
+    except BaseException as e:
+        current["attributes"]["error"] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current_span.reset(token)
+        trace.end_span(current)
+
+def export_trace(trace, directory=TRACE_EXPORT_DIR):
+    """Grava o trace em <diretório>/<instante>_<trace_id>.json; retorna o caminho, ou None se desativado."""
+    if not directory:
+        return None
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{time.strftime('%Y%m%d-%H%M%S')}_{trace.trace_id}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(trace.to_otlp(), f)
+    return path
+
+# --- Spans do Agente ---
+class TracingCallbackHandler(BaseCallbackHandler):
+    """Registra cada chamada ao modelo (com tokens) e cada execução de ferramenta como spans do trace."""
+
+    def __init__(self, trace):
+        self.trace = trace
+        self.parent_id = _current_span.get()
+        self._open = {}
+
+    def _start(self, run_id, name, attributes=None):
+        self._open[run_id] = self.trace.start_span(name, parent_id=self.parent_id, attributes=attributes)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._start(run_id, "chamada ao modelo", {"llm.model": (kwargs.get("invocation_params") or {}).get("model")})
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._start(run_id, "chamada ao modelo", {"llm.model": (kwargs.get("invocation_params") or {}).get("model")})
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        span = self._open.pop(run_id, None)
+        if span is None:
+            return
+        usage = {}
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or usage
+        self.trace.end_span(
+            span,
+            **{
+                "llm.input_tokens": usage.get("input_tokens"),
+                "llm.output_tokens": usage.get("output_tokens"),
+                "llm.total_tokens": usage.get("total_tokens"),
+            }
+        )
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        self._start(run_id, f"ferramenta {serialized.get('name', '')}".strip())
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        span = self._open.pop(run_id, None)
+        if span is not None:
+            self.trace.end_span(span)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        span = self._open.pop(run_id, None)
+        if span is not None:
+            self.trace.end_span(span, error=f"{type(error).__name__}: {error}")
+
+    on_tool_error = on_llm_error
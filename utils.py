@@ -1,17 +1,65 @@
 # --- Importações Essenciais ---
 import streamlit as st
 import re
-import google.generativeai as genai
-from google.api_core import exceptions
+import hashlib
 from fpdf import FPDF
+import io
+import html
+import base64
 import os
+from collections import OrderedDict
 from datetime import datetime
+from PIL import Image
+from report_cache import message_digest
+from gemini_clients import get_client_pool
+from tracing import span
+from assets import get_logo_bytes
+
+# Largura máxima (em pixels) das imagens embutidas no PDF; ~150 dpi na largura útil de uma página A4
+PDF_IMAGE_MAX_WIDTH = int(os.getenv("EDA_PDF_IMAGE_MAX_WIDTH", "1000"))
+FONT_PATH = "DejaVuSans.ttf"
+# Largura (em pixels) do logo no cabeçalho, que ocupa 25 mm na página
+PDF_LOGO_WIDTH = 300
+
+# --- Recursos do PDF ---
+def _shrink_for_pdf(image_bytes, max_width):
+    """Reduz a imagem à largura máxima e a recodifica em PNG com paleta de 256 cores."""
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        if image.width > max_width:
+            image = image.resize((max_width, round(image.height * max_width / image.width)), Image.LANCZOS)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA")
+        # Gráficos usam poucas cores: a paleta reduz bastante o tamanho sem diferença visível
+        method = Image.Quantize.FASTOCTREE if image.mode == "RGBA" else Image.Quantize.MEDIANCUT
+        image = image.quantize(colors=256, method=method)
+        buffer = io.BytesIO()
+        image.save(buffer, format="PNG", optimize=True)
+    return buffer.getvalue()
+
+@st.cache_resource
+def get_pdf_assets():
+    """Logo (já reduzido) e fonte Unicode, verificados e carregados uma única vez por processo."""
+    logo = get_logo_bytes()
+    if logo is not None:
+        logo = _shrink_for_pdf(logo, PDF_LOGO_WIDTH)
+    return {"logo": logo, "font_path": FONT_PATH if os.path.exists(FONT_PATH) else None}
+
+@st.cache_resource(max_entries=256)
+def get_pdf_image(figure_id, _image_bytes):
+    """Versão do gráfico para o PDF, preparada uma única vez por processo e compartilhada entre as sessões."""
+    try:
+        return _shrink_for_pdf(_image_bytes, PDF_IMAGE_MAX_WIDTH)
+    except Exception:
+        return _image_bytes
 
 # --- Classe para PDF com Cabeçalho e Rodapé ---
 class PDF(FPDF):
+    logo = None
+
     def header(self):
-        if os.path.exists("asset/LOGO.png"):
-            self.image("asset/LOGO.png", 10, 8, 25)
+        if self.logo is not None:
+            # Bytes idênticos: o fpdf embute o logo uma única vez e reaproveita nas demais páginas
+            self.image(io.BytesIO(self.logo), 10, 8, 25)
         self.set_font('Arial', 'B', 15)
         self.cell(0, 10, 'Relatório de Análise de Dados', 0, 1, 'C')
         
@@ -28,51 +76,71 @@ class PDF(FPDF):
         self.set_font('Arial', 'I', 8)
         self.cell(0, 10, f'Página {self.page_no()}', 0, 0, 'C')
 
-# --- Função de Geração de PDF ---
-def export_chat_to_pdf(messages, user_name, llm):
-    """Gera um relatório em PDF a partir do histórico de mensagens, incluindo um sumário executivo."""
-    
-    # 1. Gerar o Sumário Executivo com o LLM
-    summary_text = ""
-    try:
-        conversation_history = "\n".join([f"{msg['role']}: {msg['content']}" for msg in messages])
-        summary_prompt = f"""
-Você é um analista de dados sênior. Sua tarefa é ler o histórico de uma conversa entre um usuário e um agente de IA sobre uma análise de dados e escrever um sumário executivo conciso em português (2 a 3 parágrafos). 
-O sumário deve destacar as principais perguntas feitas, as análises realizadas e os insights ou conclusões mais importantes encontrados. Ignore saudações e foque nos resultados.
+# --- Geração do Relatório ---
+def _message_block(message, user_name, figure_store):
+    """Prepara o conteúdo de uma mensagem para o relatório: autor, texto e imagens reduzidas e sem repetição."""
+    images, seen = [], set()
+    for figure_id in message.get("images", []):
+        image_bytes = figure_store.get(figure_id)
+        if image_bytes is not None and figure_id not in seen:
+            seen.add(figure_id)
+            images.append(get_pdf_image(figure_id, image_bytes))
+    is_user = message["role"] == "user"
+    return {
+        "is_user": is_user,
+        "actor": user_name if is_user else "Agente de IA",
+        "text": message["content"],
+        "images": images,
+    }
 
-Histórico da Conversa:
----
-{conversation_history}
----
+def build_report(messages, user_name, llm, figure_store, memory, report_cache, progress=None):
+    """Etapas comuns a todos os formatos: sumário executivo (incremental) e blocos preparados de cada mensagem."""
+    progress = progress or (lambda fraction, text: None)
+    digests = [message_digest(m) for m in messages]
 
-Sumário Executivo:"""
-        
-        response = llm.invoke(summary_prompt)
-        summary_text = response.content
-    except Exception as e:
-        summary_text = f"Ocorreu um erro ao gerar o sumário executivo: {e}"
+    # 1. Gerar o Sumário Executivo com o LLM (de forma incremental, só com as mensagens novas)
+    progress(0.05, "Escrevendo o sumário executivo...")
+    with span("sumário executivo"):
+        try:
+            summary_text = report_cache.executive_summary(messages, digests, llm, memory)
+        except Exception as e:
+            summary_text = f"Ocorreu um erro ao gerar o sumário executivo: {e}"
+
+    # 2. Preparar as mensagens; só as que ainda não estão no cache são processadas
+    blocks = []
+    with span("preparação das mensagens", messages=len(messages)):
+        for i, (msg, digest) in enumerate(zip(messages, digests)):
+            blocks.append(report_cache.get_block(digest, lambda: _message_block(msg, user_name, figure_store)))
+            progress(0.5 + 0.3 * (i + 1) / len(messages), "Preparando as mensagens e os gráficos...")
+    report_cache.prune_blocks(digests)
 
-    # 2. Gerar o PDF
+    return {
+        "author": user_name,
+        "generation_date": datetime.now().strftime("%d/%m/%Y %H:%M:%S"),
+        "summary": summary_text,
+        "blocks": blocks,
+        "digests": digests,
+    }
+
+def render_pdf(report):
+    """Monta o PDF do relatório: sumário executivo seguido do histórico detalhado."""
+    assets = get_pdf_assets()
     pdf = PDF()
-    pdf.author = user_name
-    pdf.generation_date = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
+    pdf.logo = assets["logo"]
+    pdf.author = report["author"]
+    pdf.generation_date = report["generation_date"]
     pdf.add_page()
     
     # Adiciona fontes que suportam caracteres Unicode, com fallback para Arial
-    try:
-        pdf.add_font('DejaVu', '', 'DejaVuSans.ttf', uni=True)
-        pdf.set_font('DejaVu', '', 10)
-        font_family = 'DejaVu'
-    except Exception:
-        st.warning("Fonte DejaVuSans.ttf não encontrada. Usando Arial como alternativa. Caracteres especiais podem não ser exibidos corretamente.")
-        pdf.set_font('Arial', '', 10)
-        font_family = 'Arial'
+    font_family = 'DejaVu' if assets["font_path"] else 'Arial'
+    if assets["font_path"]:
+        pdf.add_font('DejaVu', '', assets["font_path"])
 
     # Adiciona o Sumário Executivo
     pdf.set_font(font_family, 'B' if font_family == 'Arial' else '', 12)
     pdf.cell(0, 10, 'Sumário Executivo', 0, 1, 'L')
     pdf.set_font(font_family, '', 10)
-    pdf.multi_cell(0, 5, summary_text)
+    pdf.multi_cell(0, 5, report["summary"])
     pdf.add_page() # Nova página para o histórico detalhado
 
     pdf.set_fill_color(240, 240, 240)
@@ -82,134 +150,209 @@ Sumário Executivo:"""
     pdf.cell(0, 10, 'Histórico Detalhado da Análise', 0, 1, 'L')
     pdf.ln(5)
 
-    for msg in messages:
-        is_user = msg["role"] == "user"
-        
+    for block in report["blocks"]:
         # Define o estilo para a mensagem
-        pdf.set_font(font_family, 'B' if is_user and font_family == 'Arial' else '', 11)
+        pdf.set_font(font_family, 'B' if block["is_user"] and font_family == 'Arial' else '', 11)
         pdf.set_text_color(0, 0, 0)
         
         # Cabeçalho da mensagem (Usuário ou Agente)
-        actor = user_name if is_user else "Agente de IA"
-        pdf.cell(0, 10, actor, 0, 1, 'L')
+        pdf.cell(0, 10, block["actor"], 0, 1, 'L')
         
         # Corpo da mensagem
         pdf.set_font(font_family, '', 10)
-        pdf.multi_cell(w=0, h=5, text=msg["content"], border=0, align='L', fill=is_user)
+        pdf.multi_cell(w=0, h=5, text=block["text"], border=0, align='L', fill=block["is_user"])
         
-        # Adiciona imagens se existirem
-        if "images" in msg:
-            for img_path in msg["images"]:
-                if os.path.exists(img_path):
-                    pdf.ln(5)
-                    # Adiciona a imagem, garantindo que não exceda a largura da página
-                    pdf.image(img_path, x=None, y=None, w=pdf.w - 40)
-                    pdf.ln(5)
+        # Adiciona as imagens; gráficos repetidos na conversa são embutidos uma única vez pelo fpdf
+        for image_bytes in block["images"]:
+            pdf.ln(5)
+            # Adiciona a imagem, garantindo que não exceda a largura da página
+            pdf.image(io.BytesIO(image_bytes), x=None, y=None, w=pdf.w - 40)
+            pdf.ln(5)
             
         pdf.ln(7) # Espaçamento reduzido entre mensagens
 
-    return bytes(pdf.output(dest='S'))
+    return bytes(pdf.output())
+
+def _data_uri(image_bytes):
+    """Data URI da imagem, com o tipo lido dos próprios bytes (os gráficos armazenados podem estar em WebP ou PNG)."""
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        mime_type = Image.MIME.get(image.format, "image/png")
+    return f"data:{mime_type};base64," + base64.b64encode(image_bytes).decode()
+
+def render_html(report):
+    """Relatório em uma única página HTML, com os gráficos embutidos."""
+    parts = [
+        "<!DOCTYPE html>",
+        '<html lang="pt-BR"><head><meta charset="utf-8"><title>Relatório de Análise de Dados</title>',
+        "<style>body{font-family:sans-serif;max-width:900px;margin:auto;padding:1em;line-height:1.5}"
+        ".msg{margin:1em 0}.user{background:#f0f0f0;padding:.5em}.text{white-space:pre-wrap}img{max-width:100%}</style>",
+        "</head><body>",
+        "<h1>Relatório de Análise de Dados</h1>",
+        f"<p>Autor: {html.escape(report['author'])}<br>Gerado em: {report['generation_date']}</p>",
+        "<h2>Sumário Executivo</h2>",
+        f'<div class="text">{html.escape(report["summary"])}</div>',
+        "<h2>Histórico Detalhado da Análise</h2>",
+    ]
+    for block in report["blocks"]:
+        css_class = "msg user" if block["is_user"] else "msg"
+        parts.append(f'<div class="{css_class}"><strong>{html.escape(block["actor"])}</strong>')
+        parts.append(f'<div class="text">{html.escape(block["text"])}</div>')
+        parts += [f'<img src="{_data_uri(image_bytes)}">' for image_bytes in block["images"]]
+        parts.append("</div>")
+    parts.append("</body></html>")
+    return "\n".join(parts).encode("utf-8")
+
+def render_markdown(report):
+    """Relatório em Markdown, com os gráficos embutidos como data URIs."""
+    lines = [
+        "# Relatório de Análise de Dados",
+        "",
+        f"Autor: {report['author']}  ",
+        f"Gerado em: {report['generation_date']}",
+        "",
+        "## Sumário Executivo",
+        "",
+        report["summary"],
+        "",
+        "## Histórico Detalhado da Análise",
+    ]
+    for block in report["blocks"]:
+        lines += ["", f"### {block['actor']}", "", block["text"]]
+        lines += ["", *(f"![Gráfico]({_data_uri(image_bytes)})" for image_bytes in block["images"])]
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+REPORT_RENDERERS = {"pdf": render_pdf, "html": render_html, "md": render_markdown}
+
+def export_chat_report(messages, user_name, llm, figure_store, memory, report_cache, report_format="pdf", progress=None):
+    """Gera o relatório da conversa no formato pedido (pdf, html ou md) e retorna os bytes do arquivo."""
+    progress = progress or (lambda fraction, text: None)
+    report = build_report(messages, user_name, llm, figure_store, memory, report_cache, progress)
+
+    # Conversa e sumário inalterados desde a última geração neste formato: o arquivo anterior é reaproveitado
+    key = hashlib.blake2b("\0".join([report_format, user_name, report["summary"], *report["digests"]]).encode(), digest_size=16).hexdigest()
+    cached = report_cache.outputs.get(report_format)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+
+    progress(0.85, "Montando o arquivo...")
+    with span(f"montagem do arquivo ({report_format})") as render_span:
+        data = REPORT_RENDERERS[report_format](report)
+        if render_span is not None:
+            render_span["attributes"]["output.bytes"] = len(data)
+    report_cache.outputs[report_format] = (key, data)
+    return data
 
 
 # --- Funções de Formatação de Pensamentos do Agente ---
-def parse_agent_thoughts(thought_string):
-    """Analisa a string de saída do agente e a transforma em uma lista estruturada."""
-    ansi_escape = re.compile(r'\x1B(?:[@-Z\\-_]|(?:\\[0-?]*[ -/]*[@-~]))')
-    thought_string = ansi_escape.sub('', thought_string)
-    if '> Finished chain.' in thought_string:
-        thought_string = thought_string.split('> Finished chain.')[0]
-    pattern = re.compile(r"(Thought|Action|Action Input|Observation):(.+?)(?=(Thought|Action|Action Input|Observation):|> Entering new AgentExecutor chain.|$)", re.DOTALL)
-    matches = pattern.findall(thought_string)
-    parsed_steps = []
-    for match in matches:
-        step_type = match[0].strip()
-        content = match[1].strip()
-        parsed_steps.append({"type": step_type, "content": content})
-    return parsed_steps
-
-def display_formatted_thoughts(parsed_thoughts):
-    """Exibe os pensamentos do agente de forma formatada no Streamlit."""
-    for i, step in enumerate(parsed_thoughts):
+def parse_agent_thoughts(agent_log):
+    """Extrai o pensamento (Thought) do texto gerado pelo LLM em um passo do agente."""
+    thought = re.split(r"(?:Action:|Final Answer:)", agent_log, maxsplit=1)[0].strip()
+    if thought.startswith("Thought:"):
+        thought = thought[len("Thought:"):].strip()
+    return [{"type": "Thought", "content": thought}] if thought else []
+
+def _fenced(text, language=""):
+    """Bloco de código Markdown com uma cerca maior que qualquer sequência de crases do texto."""
+    longest = max((len(run) for run in re.findall(r"`+", text)), default=0)
+    fence = "`" * max(3, longest + 1)
+    return f"{fence}{language}\n{text}\n{fence}"
+
+def format_thoughts_markdown(parsed_thoughts):
+    """Converte os pensamentos do agente em um único bloco Markdown, exibido com uma só chamada ao Streamlit."""
+    parts = []
+    for step in parsed_thoughts:
         if step["type"] == "Thought":
-            st.markdown(f"🤔 **Pensamento**")
-            st.markdown(f"> {step['content'].strip()}")
+            parts.append("🤔 **Pensamento**\n\n" + "\n".join(f"> {line}" for line in step["content"].strip().splitlines()))
         elif step["type"] == "Action":
-            st.markdown(f"🎬 **Ação:** `{step['content']}`")
+            parts.append(f"🎬 **Ação:** `{step['content']}`")
         elif step["type"] == "Action Input":
-            st.markdown(f"⌨️ **Input da Ação**")
-            st.code(step['content'], language='python')
+            parts.append("⌨️ **Input da Ação**\n\n" + _fenced(step["content"], "python"))
         elif step["type"] == "Observation":
-            st.markdown(f"🔍 **Observação**")
-            st.text(step['content'])
-        if i < len(parsed_thoughts) - 1:
-            st.markdown("--- ")
+            parts.append("🔍 **Observação**\n\n" + _fenced(step["content"], "text"))
+    return "\n\n---\n\n".join(parts)
 
-# --- Funções de Validação e Obtenção de Modelos ---
-def validate_gemini_api_key(api_key):
-    try:
-        genai.configure(api_key=api_key)
-        genai.list_models()
-        return True
-    except exceptions.PermissionDenied:
-        st.error("Chave de API do Gemini inválida ou sem permissão.")
-        return False
-    except Exception as e:
-        st.error(f"Ocorreu um erro ao validar a chave de API: {e}")
-        return False
+# --- Renderização do Histórico ---
+# Mensagens exibidas no histórico; as anteriores são carregadas sob demanda, em páginas do mesmo tamanho
+HISTORY_WINDOW = int(os.getenv("EDA_HISTORY_WINDOW", "20"))
+# Blocos Markdown já montados, mantidos por sessão
+RENDER_CACHE_MAX_ENTRIES = 256
 
-def get_gemini_models():
-    try:
-        return [m.name for m in genai.list_models() if 'generateContent' in m.supported_generation_methods]
-    except Exception as e:
-        st.warning(f"Não foi possível buscar modelos Gemini. Verifique a API Key. Erro: {e}")
-        return []
+def _rendered_thoughts(message):
+    """Markdown dos pensamentos da mensagem, montado uma única vez por sessão."""
+    cache = st.session_state.setdefault("rendered_thoughts", OrderedDict())
+    thoughts = message["thoughts"]
+    # Respostas iguais podem ter raciocínios diferentes: os pensamentos também entram na chave
+    key = (message_digest(message), hashlib.blake2b(str(thoughts).encode(), digest_size=16).hexdigest())
+    if key not in cache:
+        cache[key] = format_thoughts_markdown(thoughts) if isinstance(thoughts, list) else _fenced(str(thoughts), "text")
+        while len(cache) > RENDER_CACHE_MAX_ENTRIES:
+            cache.popitem(last=False)
+    cache.move_to_end(key)
+    return cache[key]
 
-    ansi_escape = re.compile(r'\x1B(?:[@-Z\\-_]|(?:\\[0-?]*[ -/]*[@-~]))')
-    thought_string = ansi_escape.sub('', thought_string)
-    if '> Finished chain.' in thought_string:
-        thought_string = thought_string.split('> Finished chain.')[0]
-    pattern = re.compile(r"(Thought|Action|Action Input|Observation):(.+?)(?=(Thought|Action|Action Input|Observation):|> Entering new AgentExecutor chain.|$)", re.DOTALL)
-    matches = pattern.findall(thought_string)
-    parsed_steps = []
-    for match in matches:
-        step_type = match[0].strip()
-        content = match[1].strip()
-        parsed_steps.append({"type": step_type, "content": content})
-    return parsed_steps
-
-def display_formatted_thoughts(parsed_thoughts):
-    """Exibe os pensamentos do agente de forma formatada no Streamlit."""
-    for i, step in enumerate(parsed_thoughts):
-        if step["type"] == "Thought":
-            st.markdown(f"🤔 **Pensamento**")
-            st.markdown(f"> {step['content'].strip()}")
-        elif step["type"] == "Action":
-            st.markdown(f"🎬 **Ação:** `{step['content']}`")
-        elif step["type"] == "Action Input":
-            st.markdown(f"⌨️ **Input da Ação**")
-            st.code(step['content'], language='python')
-        elif step["type"] == "Observation":
-            st.markdown(f"🔍 **Observação**")
-            st.text(step['content'])
-        if i < len(parsed_thoughts) - 1:
-            st.markdown("--- ")
+def display_message(message, figure_store):
+    """Exibe uma mensagem do chat: texto, gráficos armazenados e, se houver, os pensamentos do agente."""
+    st.markdown(message["content"])
+    if message.get("cached"):
+        st.caption("⚡ Resposta recuperada do cache")
+    for figure_id in message.get("images", []):
+        image_bytes = figure_store.get(figure_id)
+        if image_bytes is not None:
+            st.image(image_bytes)
+    if message.get("role") == "assistant" and message.get("thoughts"):
+        with st.expander("Ver pensamentos do Agente 🧠"):
+            st.markdown(_rendered_thoughts(message))
+    if message.get("role") == "assistant" and message.get("trace"):
+        display_trace_breakdown(message["trace"])
+
+def display_chat_history(messages, figure_store, window=HISTORY_WINDOW):
+    """Exibe apenas as últimas mensagens; as anteriores ficam ocultas até o usuário pedir para carregá-las."""
+    visible = st.session_state.setdefault("history_visible", window)
+    hidden = max(0, len(messages) - visible)
+    if hidden:
+        if st.button(f"⬆️ Carregar mensagens anteriores ({hidden} ocultas)", key="load_older_messages"):
+            st.session_state.history_visible = visible + window
+            st.rerun()
+    for message in messages[hidden:]:
+        with st.chat_message(message["role"]):
+            display_message(message, figure_store)
+
+def reset_chat_history_window():
+    st.session_state.pop("history_visible", None)
+    st.session_state.pop("rendered_thoughts", None)
+
+def display_trace_breakdown(rows):
+    """Detalhamento do tempo da resposta por etapa, com tokens e variação de memória do processo."""
+    with st.expander("Ver tempos da resposta ⏱️"):
+        st.dataframe(
+            [
+                {
+                    "Etapa": "\u2003" * row["depth"] + row["name"],
+                    "Duração (ms)": row["duration_ms"],
+                    "Tokens": row["tokens"],
+                    "Δ Memória (MB)": round(row["memory_delta_bytes"] / (1024 * 1024), 1),
+                }
+                for row in rows
+            ],
+            hide_index=True,
+            use_container_width=True
+        )
 
 # --- Funções de Validação e Obtenção de Modelos ---
 def validate_gemini_api_key(api_key):
     try:
-        genai.configure(api_key=api_key)
-        genai.list_models()
-        return True
-    except exceptions.PermissionDenied:
+        # Resultado em cache no pool: uma chave já validada não gera nova chamada à API
+        if get_client_pool().validate(api_key):
+            return True
         st.error("Chave de API do Gemini inválida ou sem permissão.")
         return False
     except Exception as e:
         st.error(f"Ocorreu um erro ao validar a chave de API: {e}")
         return False
 
-def get_gemini_models():
+def get_gemini_models(api_key):
     try:
-        return [m.name for m in genai.list_models() if 'generateContent' in m.supported_generation_methods]
+        return get_client_pool().list_models(api_key)
     except Exception as e:
         st.warning(f"Não foi possível buscar modelos Gemini. Verifique a API Key. Erro: {e}")
-        return []
\ No newline at end of file
+        return []
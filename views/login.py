@@ -1,18 +1,14 @@
 # --- Importações Essenciais ---
 import streamlit as st
-import os
-import base64
-from utils import validate_gemini_api_key
+from assets import get_logo_html
 
 def login_page():
     """Exibe a página de login em um layout centralizado."""
     _, col, _ = st.columns([1, 2, 1])
     with col:
-        logo_path = "asset\LOGO.png"
-        if os.path.exists(logo_path):
-            with open(logo_path, "rb") as f:
-                data = base64.b64encode(f.read()).decode("utf-8")
-            st.markdown(f"<div style='text-align: center'><img src='data:image/png;base64,{data}' width='300'></div>", unsafe_allow_html=True)
+        logo_html = get_logo_html(300)
+        if logo_html:
+            st.markdown(logo_html, unsafe_allow_html=True)
                 
         name = st.text_input("Seu Nome", key="login_name")
         password = st.text_input("Insira sua API Key do Gemini", type="password", key="login_password")
@@ -20,12 +16,15 @@ def login_page():
         if st.button("Login", use_container_width=True, type="primary"):
             if name and password:
                 with st.spinner("Validando sua chave de API..."):
+                    # Importado só no clique: o cliente do Gemini não atrasa a exibição da página
+                    from utils import validate_gemini_api_key
                     is_valid = validate_gemini_api_key(password)
                 
                 if is_valid:
                     st.session_state["logged_in"] = True
                     st.session_state["user_name"] = name
-                    os.environ["GOOGLE_API_KEY"] = password
+                    # A chave fica apenas na sessão do usuário; os clientes são obtidos do pool por chave
+                    st.session_state["api_key"] = password
                     st.success("Login bem-sucedido!")
                     st.rerun()
                 # Se a chave não for válida, a função validate_gemini_api_key já exibe o st.error.
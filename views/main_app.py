@@ -1,60 +1,141 @@
 # --- Importações Essenciais ---
 import streamlit as st
-import pandas as pd
-import os
-import uuid
-import shutil
-import io
-from contextlib import redirect_stdout
-from langchain_experimental.agents import create_pandas_dataframe_agent
-from langchain_google_genai import ChatGoogleGenerativeAI
+from datetime import datetime
 from utils import (
     get_gemini_models, 
-    parse_agent_thoughts, 
-    display_formatted_thoughts,
-    export_chat_to_pdf
+    display_message,
+    display_chat_history,
+    reset_chat_history_window,
+    display_trace_breakdown,
+    get_pdf_assets
 )
+from ingestion import load_dataframe, load_stored_dataframe, get_sample, format_bytes, PYARROW_AVAILABLE
+from dataset_store import list_datasets
+from plot_capture import capture_plots
+from figure_store import get_figure_store
+from agent import get_llm, get_agent, run_agent, embed_prompt, build_system_prompt, sampling_prompt, StreamingResponseHandler
+from profiling import get_dataset_profile
+from sampling import stratification_candidates, margin_of_error
+from conversation_memory import get_conversation_memory, reset_conversation_memory
+from report_cache import get_report_cache, reset_report_cache
+from report_jobs import REPORT_FORMATS, submit_report_job, get_report_job
+from gemini_clients import get_client_pool
+from llm_scheduler import is_transient
+from tracing import start_trace, span, export_trace, TracingCallbackHandler
+from assets import get_logo_bytes
+from auto_eda import AUTO_EDA_REQUEST, run_auto_eda
+from session_store import (
+    get_session_store,
+    session_owner,
+    get_session_messages,
+    append_session_message,
+    start_new_session,
+    resume_session
+)
+from query_cache import get_query_cache, normalize_prompt, query_scope, QUERY_CACHE_SEMANTIC
+
+# Intervalo (em segundos) entre as atualizações do progresso do relatório
+REPORT_POLL_S = 1.0
+
+def report_job_panel(polling):
+    """Progresso do relatório em andamento ou, quando pronto, o botão de download."""
+    job = get_report_job()
+    if job is None:
+        return
+    done = job.done
+    if not done:
+        st.progress(job.progress, text=job.message)
+        st.caption("Você pode continuar conversando enquanto o relatório é gerado.")
+    elif job.error:
+        st.error(f"Ocorreu um erro ao gerar o relatório: {job.error}")
+    else:
+        extension, mime = REPORT_FORMATS[job.report_format]
+        st.download_button(
+            label=f"Baixar {job.report_format}",
+            data=job.result,
+            file_name=f"relatorio_eda_{st.session_state.get('current_file', 'analise').split('.')[0]}.{extension}",
+            mime=mime,
+            key=f"download_{job.id}"
+        )
+
+    # A partir da segunda execução, o painel está sendo atualizado sozinho; ao terminar, uma execução
+    # completa da página encerra a atualização periódica
+    st.session_state.report_panel_runs += 1
+    if done and polling and st.session_state.report_panel_runs > 1:
+        st.rerun()
+
+def resume_panel(figure_store):
+    """Lista as análises gravadas do usuário; retoma a escolhida (com o dataset dela quando ainda armazenado) ou a exclui."""
+    sessions = get_session_store().list_sessions(session_owner())
+    current = st.session_state.get("stored_session_id")
+    sessions = [s for s in sessions if s["id"] != current and s["messages"]]
+    if not sessions:
+        return
+    with st.expander("📂 Análises anteriores"):
+        for stored in sessions:
+            updated = datetime.fromtimestamp(stored["updated_at"]).strftime("%d/%m %H:%M")
+            st.caption(f"**{stored['title']}** · {stored['file_name'] or 'sem arquivo'} · {stored['messages']} mensagens · {updated}")
+            col_resume, col_delete = st.columns(2)
+            if col_delete.button("🗑️ Excluir", key=f"delete_{stored['id']}", use_container_width=True):
+                # Apaga do banco as mensagens e os gráficos que só esta análise usava
+                get_session_store().delete(stored["id"])
+                st.rerun()
+            if col_resume.button("Retomar", key=f"resume_{stored['id']}", use_container_width=True):
+                meta = resume_session(stored["id"])
+                reset_conversation_memory()
+                reset_report_cache()
+                reset_chat_history_window()
+                st.session_state.pop('report_job', None)
+                figure_store.clear()
+                # O novo file_uploader começa vazio e a seleção de datasets salvos já aponta para o da análise
+                st.session_state.uploader_key += 1
+                stored_names = {m["hash"]: m["name"] for m in list_datasets()}
+                if meta["dataset_hash"] in stored_names:
+                    # O nome do dataset salvo identifica o arquivo atual: a análise retomada não é reiniciada ao abri-lo
+                    st.session_state.current_file = stored_names[meta["dataset_hash"]]
+                    st.session_state[f"stored_{st.session_state.uploader_key}"] = meta["dataset_hash"]
+                else:
+                    st.session_state.current_file = meta["file_name"]
+                    st.session_state.resume_warning = f"O dataset desta análise não está mais armazenado; carregue novamente o arquivo {meta['file_name']}."
+                st.rerun()
 
 def main_app():
     """A aplicação principal de EDA."""
-    plots_dir = "temp_plots"
     if 'uploader_key' not in st.session_state: st.session_state.uploader_key = 0
+    figure_store = get_figure_store()
     
     # --- Carregamento de Modelos ---
-    @st.cache_data
-    def load_models():
-        gemini_models = get_gemini_models()
-        return gemini_models
-    
-    gemini_models = load_models()
+    # O catálogo fica em cache (com validade) no pool de clientes, por chave de API
+    gemini_models = get_gemini_models(st.session_state["api_key"])
+    if "resume_warning" in st.session_state:
+        st.warning(st.session_state.pop("resume_warning"))
 
     # --- Barra Lateral ---
     with st.sidebar:
-        logo_path = "asset/LOGO.png"
-        if os.path.exists(logo_path):
-            st.image(logo_path, width=200)
+        logo = get_logo_bytes()
+        if logo is not None:
+            st.image(logo, width=200)
         st.header(f"Bem-vindo, {st.session_state['user_name']}!")
 
         col1, col2 = st.columns(2)
         with col1:
             if st.button("Logout", use_container_width=True):
-                if os.path.exists(plots_dir):
-                    shutil.rmtree(plots_dir)
                 st.session_state.clear()
-                if "GOOGLE_API_KEY" in os.environ:
-                    del os.environ["GOOGLE_API_KEY"]
                 st.rerun()
         with col2:
             if st.button("Reiniciar Chat", use_container_width=True):
-                if 'messages' in st.session_state:
-                    del st.session_state.messages
-                if os.path.exists(plots_dir):
-                    shutil.rmtree(plots_dir)
-                    os.makedirs(plots_dir, exist_ok=True)
+                start_new_session()
+                reset_conversation_memory()
+                reset_report_cache()
+                reset_chat_history_window()
+                st.session_state.pop('report_job', None)
+                figure_store.clear()
                 # Incrementa a chave para forçar o reset do file_uploader
                 st.session_state.uploader_key += 1
                 st.rerun()
 
+        resume_panel(figure_store)
+
         st.divider()
         st.header("Painel de Controle")
         
@@ -67,182 +148,275 @@ def main_app():
         else:
             st.warning("Nenhum modelo Gemini encontrado.")
 
+        use_pyarrow = st.toggle(
+            "Leitura rápida com PyArrow",
+            value=False,
+            disabled=not PYARROW_AVAILABLE,
+            help="Lê o CSV em várias threads. Requer o pacote pyarrow e usa mais memória durante a leitura."
+        )
+        use_sampling = st.toggle(
+            "Modo Amostragem",
+            value=False,
+            help="Para arquivos grandes: o agente explora uma amostra e usa os dados completos apenas no cálculo final."
+        )
+        if use_sampling:
+            sample_size = st.number_input("Linhas na amostra", min_value=1000, value=100000, step=10000)
+            sample_method = st.radio("Tipo de amostra", ["Aleatória", "Estratificada"], horizontal=True)
         uploaded_file = st.file_uploader("Selecione seu arquivo CSV", type=["csv"], key=f"uploader_{st.session_state.uploader_key}")
 
+        # Datasets já convertidos para o armazenamento local podem ser reabertos sem novo upload
+        stored_hash = None
+        stored_datasets = {m["hash"]: m for m in list_datasets()}
+        if uploaded_file is None and stored_datasets:
+            stored_hash = st.selectbox(
+                "Ou reabra um dataset salvo",
+                [None] + list(stored_datasets),
+                format_func=lambda h: "—" if h is None else f"{stored_datasets[h]['name']} ({stored_datasets[h]['rows']} linhas)",
+                key=f"stored_{st.session_state.uploader_key}"
+            )
+
         st.divider()
 
         # Seção de Exportação
-        if st.session_state.get("messages"):
+        messages = get_session_messages()
+        if messages:
             st.subheader("Exportar Análise")
-            if st.button("Gerar Relatório em PDF"):
-                with st.spinner("O agente está escrevendo o sumário e gerando o PDF..."):
-                    # Inicializa o LLM para ser usado na criação do sumário
-                    llm = None
-                    if selected_model and os.getenv("GOOGLE_API_KEY"):
-                        llm = ChatGoogleGenerativeAI(model=selected_model.replace('models/', ''), temperature=0)
-                    
-                    if llm:
-                        pdf_data = export_chat_to_pdf(st.session_state.messages, st.session_state['user_name'], llm)
-                        st.session_state['pdf_data'] = pdf_data
-                    else:
-                        st.error("Não foi possível inicializar o modelo para gerar o sumário.")
+            report_job = get_report_job()
+            job_running = report_job is not None and not report_job.done
+            report_format = st.selectbox("Formato do relatório", list(REPORT_FORMATS), disabled=job_running)
+            if st.button("Gerar Relatório", disabled=job_running):
+                # Inicializa o LLM para ser usado na criação do sumário
+                llm = None
+                if selected_model and st.session_state.get("api_key"):
+                    llm = get_llm(selected_model)
+                
+                if llm:
+                    if report_format == "PDF" and not get_pdf_assets()["font_path"]:
+                        st.warning("Fonte DejaVuSans.ttf não encontrada. Usando Arial como alternativa. Caracteres especiais podem não ser exibidos corretamente.")
+                    submit_report_job(report_format, messages, st.session_state['user_name'], llm, figure_store, get_conversation_memory(), get_report_cache())
+                    job_running = True
+                else:
+                    st.error("Não foi possível inicializar o modelo para gerar o sumário.")
             
-            if st.session_state.get('pdf_data') is not None:
-                st.download_button(
-                    label="Baixar PDF",
-                    data=st.session_state.get('pdf_data'),
-                    file_name=f"relatorio_eda_{st.session_state.get('current_file', 'analise').split('.')[0]}.pdf",
-                    mime="application/pdf"
-                )
+            # O painel se atualiza sozinho enquanto o relatório é gerado, sem bloquear o chat
+            st.session_state.report_panel_runs = 0
+            st.fragment(report_job_panel, run_every=REPORT_POLL_S if job_running else None)(job_running)
 
         st.divider()
+        stream_responses = st.toggle("Respostas em Tempo Real", value=True, help="Exibe os passos e o texto do agente enquanto ele trabalha.")
+        use_query_cache = st.toggle("Usar Cache de Respostas", value=True, help="Reaproveita respostas de perguntas já feitas sobre o mesmo arquivo com o mesmo modelo.")
         show_thoughts = st.toggle("Modo Desenvolvedor (Ver Pensamentos)", value=False)
+        if show_thoughts:
+            llm_metrics = get_client_pool().scheduler.metrics()
+            st.caption(
+                f"Fila do modelo: {llm_metrics['queued']} aguardando, {llm_metrics['active']} em andamento · "
+                f"espera média {llm_metrics['wait_avg_s']:.1f}s (máx. {llm_metrics['wait_max_s']:.1f}s) · "
+                f"{llm_metrics['retries']} novas tentativas, {llm_metrics['failures']} falhas"
+            )
 
     # --- Interface Principal ---
-    if uploaded_file is not None:
+    # Trace desta execução; é mantido (e exportado) apenas quando a execução responde a uma pergunta
+    turn_trace = start_trace("turno")
+    if uploaded_file is not None or stored_hash is not None:
+        file_name = uploaded_file.name if uploaded_file is not None else stored_datasets[stored_hash]["name"]
         # Limpa o histórico e plots se um novo arquivo for carregado
-        if st.session_state.get("current_file") != uploaded_file.name:
-            if os.path.exists(plots_dir):
-                shutil.rmtree(plots_dir)
-            os.makedirs(plots_dir, exist_ok=True)
-            st.session_state.messages = []
-            st.session_state.current_file = uploaded_file.name
+        if st.session_state.get("current_file") != file_name:
+            figure_store.clear()
+            start_new_session()
+            reset_conversation_memory()
+            reset_chat_history_window()
+            st.session_state.current_file = file_name
         try:
-            df = pd.read_csv(uploaded_file)
+            # Reutiliza o DataFrame já lido para este conteúdo (reruns não reprocessam o CSV)
+            with span("carregamento do dataset"):
+                if uploaded_file is not None:
+                    df, dataset_hash, memory_report = load_dataframe(uploaded_file, use_pyarrow=use_pyarrow)
+                else:
+                    df, memory_report = load_stored_dataframe(stored_hash)
+                    dataset_hash = stored_hash
+            st.session_state.dataset_hash = dataset_hash
             st.success("Arquivo carregado com sucesso! Amostra dos dados:")
+            raw_bytes, optimized_bytes = memory_report["raw_bytes"], memory_report["optimized_bytes"]
+            saved_pct = (1 - optimized_bytes / raw_bytes) * 100 if raw_bytes else 0
+            st.caption(f"Memória ocupada: {format_bytes(raw_bytes)} → {format_bytes(optimized_bytes)} ({saved_pct:.0f}% menor após otimização dos tipos)")
             st.dataframe(df.head())
-            if "messages" not in st.session_state: st.session_state.messages = []
+            # Perfil calculado uma única vez por dataset e usado como contexto pelo agente
+            with span("perfil do dataset"):
+                profile = get_dataset_profile(dataset_hash, df)
+
+            # --- Modo Amostragem ---
+            sample_spec = None
+            if use_sampling and sample_size < len(df):
+                stratify_column = None
+                if sample_method == "Estratificada":
+                    candidates = stratification_candidates(profile)
+                    if candidates:
+                        stratify_column = st.sidebar.selectbox("Coluna de estratificação", candidates)
+                    else:
+                        st.sidebar.warning("Nenhuma coluna adequada para estratificação; usando amostra aleatória.")
+                sample_spec = ("stratified" if stratify_column else "random", int(sample_size), stratify_column)
+                sample_rows = len(get_sample(dataset_hash, sample_spec, df))
+                error_pct = margin_of_error(sample_rows, len(df)) * 100
+                st.info(
+                    f"🎯 **Modo Amostragem:** o agente explora {sample_rows:,} de {len(df):,} linhas "
+                    f"({sample_rows / len(df):.1%}){f', estratificadas por {stratify_column}' if stratify_column else ''}. "
+                    f"Proporções estimadas na amostra têm margem de erro de ±{error_pct:.2f} p.p. (95%); "
+                    f"os cálculos finais usam o dataset completo."
+                )
+            # Exibe histórico (apenas as mensagens mais recentes; as anteriores são carregadas sob demanda)
+            messages = get_session_messages()
+            with span("renderização do histórico", messages=len(messages)):
+                display_chat_history(messages, figure_store)
+
+            # --- Análise Exploratória Automática ---
+            # Estatísticas e gráficos de todas as colunas calculados sem o agente; o modelo só narra os resultados
+            if selected_model and st.button("🔎 Análise Exploratória Automática", help="Estatísticas e gráficos de cada coluna e dos pares mais correlacionados, gerados em paralelo, com uma única chamada ao modelo."):
+                append_session_message({"role": "user", "content": AUTO_EDA_REQUEST}, figure_store)
+                with st.chat_message("user"):
+                    st.markdown(AUTO_EDA_REQUEST)
+                with st.chat_message("assistant"):
+                    try:
+                        with st.status("Gerando a análise exploratória...") as status:
+                            with span("análise exploratória automática"):
+                                content, images = run_auto_eda(
+                                    dataset_hash, df, profile, get_llm(selected_model),
+                                    progress=lambda text: status.update(label=text)
+                                )
+                            status.update(label=f"Análise exploratória concluída ({len(images)} gráficos)", state="complete")
+                        with span("armazenamento dos gráficos", figures=len(images)):
+                            figure_ids = [figure_store.add(image_bytes) for image_bytes in images]
+                        assistant_message = {"role": "assistant", "content": content, "images": figure_ids}
+                        with span("renderização da resposta"):
+                            display_message(assistant_message, figure_store)
+                        turn_trace.finish()
+                        if show_thoughts:
+                            assistant_message["trace"] = turn_trace.summary()
+                            display_trace_breakdown(assistant_message["trace"])
+                        try:
+                            export_trace(turn_trace)
+                        except OSError:
+                            pass
+                        append_session_message(assistant_message, figure_store)
+                    except Exception as e:
+                        st.error(f"Ocorreu um erro ao gerar a análise exploratória: {e}")
 
-            # Exibe histórico
-            for message in st.session_state.messages:
-                with st.chat_message(message["role"]):
-                    st.markdown(message["content"])
-                    if "images" in message:
-                        for img_path in message["images"]:
-                            if os.path.exists(img_path):
-                                st.image(img_path)
-                    if message.get("role") == "assistant" and "thoughts" in message:
-                        with st.expander("Ver pensamentos do Agente 🧠"):
-                            if isinstance(message["thoughts"], list):
-                                display_formatted_thoughts(message["thoughts"])
-                            else:
-                                st.code(message["thoughts"], language='text')
-            
             # Input do usuário
             if prompt := st.chat_input("Converse com seus dados..."):
-                st.session_state.messages.append({"role": "user", "content": prompt})
+                # Cada mensagem é gravada no banco das análises; a primeira cria a análise
+                append_session_message({"role": "user", "content": prompt}, figure_store)
+                messages = get_session_messages()
                 with st.chat_message("user"):
                     st.markdown(prompt)
 
                 # --- Lógica de Triagem ---
-                simple_greetings = ["oi", "olá", "ola", "tudo bem?", "tudo bem", "eai", "e ai"]
-                normalized_prompt = prompt.lower().strip("?!., ")
+                simple_greetings = ["oi", "ola", "tudo bem", "eai", "e ai"]
+                normalized_prompt = normalize_prompt(prompt)
+
+                # Perguntas já respondidas para o mesmo dataset e modelo são servidas do cache
+                query_cache = get_query_cache()
+                history_messages = messages[:-1]
+                scope = query_scope(dataset_hash, sample_spec, history_messages)
+                cached_result = None
+                query_embedding = None
+                if use_query_cache and selected_model and normalized_prompt not in simple_greetings:
+                    with span("consulta ao cache de respostas"):
+                        cached_result = query_cache.get(scope, selected_model, normalized_prompt)
+                        # Com histórico, perguntas quase iguais ("e para a coluna X?" / "Y?") pedem respostas diferentes
+                        if cached_result is None and QUERY_CACHE_SEMANTIC and not history_messages:
+                            query_embedding = embed_prompt(normalized_prompt)
+                            if query_embedding is not None:
+                                cached_result = query_cache.get_similar(scope, selected_model, query_embedding)
 
                 if normalized_prompt in simple_greetings:
                     # Resposta simples para saudações
                     response = "Olá! Sou seu assistente de análise. Como posso ajudar com seus dados hoje?"
                     assistant_message = {"role": "assistant", "content": response}
-                    st.session_state.messages.append(assistant_message)
+                    append_session_message(assistant_message, figure_store)
                     with st.chat_message("assistant"):
                         st.markdown(response)
+                elif cached_result is not None:
+                    assistant_message = {"role": "assistant", "content": cached_result["content"], "cached": True}
+                    # Os gráficos do cache já estão comprimidos: entram no armazenamento da sessão sem nova compressão
+                    figure_ids = [figure_store.add_compressed(figure_id, data) for figure_id, data in cached_result["figures"]]
+                    if figure_ids:
+                        assistant_message["images"] = figure_ids
+                    if show_thoughts and cached_result["thoughts"]:
+                        assistant_message["thoughts"] = cached_result["thoughts"]
+                    append_session_message(assistant_message, figure_store)
+                    with st.chat_message("assistant"):
+                        display_message(assistant_message, figure_store)
                 else:
                     # Apenas para perguntas reais, aciona o agente
-                    llm = None
-                    if selected_model and os.getenv("GOOGLE_API_KEY"):
-                        llm = ChatGoogleGenerativeAI(model=selected_model.replace('models/', ''), temperature=0)
+                    agent = None
+                    if selected_model and st.session_state.get("api_key"):
+                        # Reaproveita o agente da sessão enquanto o arquivo e o modelo não mudarem
+                        with span("construção do agente"):
+                            agent = get_agent(df, dataset_hash, selected_model, profile, sample_spec)
                     else:
                         st.error("Por favor, selecione um modelo Gemini e verifique se a chave de API está configurada.")
                     
-                    if llm:
-                        with st.spinner("O agente está pensando..."):
-                            agent = create_pandas_dataframe_agent(llm, df, agent_type="zero-shot-react-description", verbose=True, allow_dangerous_code=True, handle_parsing_errors=True)
+                    if agent:
+                        # A bolha de resposta é aberta antes da execução para receber os passos em tempo real
+                        with st.chat_message("assistant"):
                             try:
                                 # --- PROMPT ENGINEERING ---
-                                system_prompt = f"""
-Você é um assistente de IA especialista em Análise Exploratória de Dados (EDA). Sua missão é ser um parceiro analítico para o usuário.
-
-**FORMATO DE SAÍDA OBRIGATÓRIO:**
-Sua resposta DEVE SEMPRE começar com "Thought:" e terminar com o bloco "Final Answer:". Toda a sua resposta final para o usuário deve estar contida nele. NUNCA dê a resposta final sem o prefixo "Final Answer:".
-
-**Sua Diretriz Principal: Adapte-se ao usuário.**
-
-1.  **Para Saudações Simples (oi, olá, etc.):** Se o usuário apenas cumprimentar, responda de forma breve e amigável (ex: "Olá! Como posso ajudar com seus dados hoje?") e aguarde o comando dele. Não inicie uma análise completa.
-
-2.  **Para Pedidos de Análise:** Quando o usuário pedir uma análise, siga a estrutura abaixo:
-    a. **Primeiro, atenda:** Entregue o resultado direto (texto ou gráfico) que foi solicitado.
-    b. **Depois, guie:** Após entregar o resultado, agregue valor:
-        - **Explique:** Diga o que o resultado significa.
-        - **Observe:** Compartilhe qualquer insight proativo que você encontrou.
-        - **Sugira:** Recomende um próximo passo lógico para a análise.
-        - **Engaje:** Termine com uma pergunta para manter a conversa fluindo.
-
-**Outras Diretrizes Importantes:**
-- **Idioma:** Responda sempre no idioma da pergunta do usuário.
-- **Melhores Práticas:** Crie gráficos com títulos e rótulos claros.
-- **Gráficos:** Use `matplotlib` ou `seaborn`. **CRÍTICO: Salve sempre o gráfico em `plot.png`**. Não use `plt.show()`.
-"""
-                                recent_messages = st.session_state.messages[-10:]
-                                history = "\n".join([f" - {m['role']}: {m['content']}" for m in recent_messages])
+                                system_prompt = build_system_prompt(profile)
+                                if sample_spec:
+                                    system_prompt += sampling_prompt(sample_rows, len(df))
+                                # Histórico limitado por orçamento de tokens; turnos antigos entram como um resumo incremental
+                                # (a pergunta atual, última mensagem da lista, vai separada no prompt)
+                                with span("histórico da conversa"):
+                                    history = get_conversation_memory().build_context(history_messages, get_llm(selected_model))
                                 full_prompt = f"{system_prompt}\n\n**Contexto da Conversa Anterior:**\n{history}\n\n**Pergunta do Usuário:**\n{prompt}"
 
-                                # Garante que não há um plot antigo poluindo a pasta raiz
-                                if os.path.exists("plot.png"):
-                                    os.remove("plot.png")
-
-                                # 1. Snapshot dos arquivos antes da execução
-                                files_before = set(os.listdir("."))
-
-                                # Executa o agente
-                                response_dict = agent.invoke({"input": full_prompt})
-                                response = response_dict.get('output', 'Não foi possível obter uma resposta.')
-                                
-                                agent_thoughts_raw = ""
-                                if show_thoughts:
-                                    string_io = io.StringIO()
-                                    with redirect_stdout(string_io):
-                                        agent.invoke({"input": full_prompt})
-                                    agent_thoughts_raw = string_io.getvalue()
-
-                                # 2. Snapshot após execução e identifica novos arquivos
-                                files_after = set(os.listdir("."))
-                                new_files = files_after - files_before
+                                # Executa o agente uma única vez; o raciocínio é capturado durante a própria execução.
+                                # Os gráficos salvos durante a execução são capturados em memória, sem passar pelo disco.
+                                with capture_plots() as captured_images, span("execução do agente"):
+                                    # Cada chamada ao modelo (com tokens) e cada execução de ferramenta vira um span
+                                    callbacks = [TracingCallbackHandler(turn_trace)]
+                                    if stream_responses:
+                                        stream_handler = StreamingResponseHandler(st.status("O agente está trabalhando...", expanded=True), st.empty())
+                                        response, agent_thoughts = run_agent(agent, full_prompt, callbacks=[stream_handler, *callbacks])
+                                        stream_handler.finish()
+                                    else:
+                                        with st.spinner("O agente está pensando..."):
+                                            response, agent_thoughts = run_agent(agent, full_prompt, callbacks=callbacks)
+                                with span("armazenamento dos gráficos", figures=len(captured_images)):
+                                    figure_ids = [figure_store.add(image_bytes) for image_bytes in captured_images]
                                 
                                 assistant_message = {"role": "assistant", "content": response}
-                                if agent_thoughts_raw:
-                                    assistant_message["thoughts"] = parse_agent_thoughts(agent_thoughts_raw)
-
-                                # 3. Processa e move todos os novos arquivos de imagem
-                                new_image_paths = []
-                                for filename in new_files:
-                                    if filename.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.bmp')):
-                                        if not os.path.exists(plots_dir):
-                                            os.makedirs(plots_dir, exist_ok=True)
-                                        
-                                        old_path = os.path.join(".", filename)
-                                        # Gera um nome de arquivo único para evitar conflitos
-                                        unique_filename = f"{uuid.uuid4()}.png"
-                                        new_path = os.path.join(plots_dir, unique_filename)
-                                        os.rename(old_path, new_path)
-                                        new_image_paths.append(new_path)
+                                if show_thoughts and agent_thoughts:
+                                    assistant_message["thoughts"] = agent_thoughts
 
                                 # Adiciona as imagens à mensagem e as exibe
-                                if new_image_paths:
-                                    assistant_message["images"] = new_image_paths # Armazena como lista
+                                if figure_ids:
+                                    assistant_message["images"] = figure_ids # Armazena os identificadores como lista
 
-                                with st.chat_message("assistant"):
-                                    st.markdown(response)
-                                    if "images" in assistant_message:
-                                        for img_path in assistant_message["images"]:
-                                            st.image(img_path)
-                                    
-                                    if "thoughts" in assistant_message and assistant_message["thoughts"]:
-                                        with st.expander("Ver pensamentos do Agente 🧠"):
-                                            display_formatted_thoughts(assistant_message["thoughts"])
-                                
-                                st.session_state.messages.append(assistant_message)
+                                with span("renderização da resposta"):
+                                    display_message(assistant_message, figure_store)
+                                turn_trace.finish()
+                                if show_thoughts:
+                                    # Detalhamento exibido no modo desenvolvedor, ao lado dos pensamentos do agente
+                                    assistant_message["trace"] = turn_trace.summary()
+                                    display_trace_breakdown(assistant_message["trace"])
+                                try:
+                                    export_trace(turn_trace)
+                                except OSError:
+                                    pass
+                                append_session_message(assistant_message, figure_store)
+                                # O cache guarda os gráficos comprimidos do armazenamento da sessão, não os PNGs originais
+                                cached_figures = [(figure_id, figure_store.get(figure_id)) for figure_id in figure_ids]
+                                query_cache.put(
+                                    scope, selected_model, normalized_prompt,
+                                    {"content": response, "thoughts": agent_thoughts, "figures": [(figure_id, data) for figure_id, data in cached_figures if data is not None]},
+                                    embedding=query_embedding
+                                )
 
                             except Exception as e:
-                                st.error(f"Ocorreu um erro ao executar o agente: {e}")
+                                if is_transient(e):
+                                    st.error("O serviço do Gemini está sobrecarregado ou a cota da sua chave foi atingida, mesmo após novas tentativas. Aguarde alguns instantes e pergunte novamente.")
+                                else:
+                                    st.error(f"Ocorreu um erro ao executar o agente: {e}")
         except Exception as e:
             st.error(f"Ocorreu um erro ao carregar o arquivo CSV: {e}")
     else:
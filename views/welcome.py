@@ -1,13 +1,9 @@
 # --- Importações Essenciais ---
 import streamlit as st
-import base64
-import os
+from assets import get_logo_html
 
-def welcome_screen():
-    """Exibe a tela de boas-vindas com um design aprimorado e moderno."""
-
-    # CSS para estilizar os cartões e a página
-    st.markdown("""
+# CSS para estilizar os cartões e a página (montado uma única vez, na importação)
+WELCOME_CSS = """
     <style>
     .card {
         background-color: #f8f9fa;
@@ -40,19 +36,18 @@ def welcome_screen():
         border-radius: 8px;
     }
     </style>
-    """, unsafe_allow_html=True)
+    """
+
+def welcome_screen():
+    """Exibe a tela de boas-vindas com um design aprimorado e moderno."""
+    st.markdown(WELCOME_CSS, unsafe_allow_html=True)
 
     # --- Seção Hero ---
     with st.container():
         # Logo
-        logo_path = "asset/LOGO.png"
-        if os.path.exists(logo_path):
-            with open(logo_path, "rb") as f:
-                data = base64.b64encode(f.read()).decode("utf-8")
-            st.markdown(
-                f"<div style='text-align: center; padding-bottom: 20px;'><img src='data:image/png;base64,{data}' width='300'></div>",
-                unsafe_allow_html=True
-            )
+        logo_html = get_logo_html(300, " padding-bottom: 20px;")
+        if logo_html:
+            st.markdown(logo_html, unsafe_allow_html=True)
         
         st.markdown("<h1 style='text-align: center; color: #2c3e50;'>First Class Agent EDA</h1>", unsafe_allow_html=True)
         st.markdown("<h3 style='text-align: center; color: #34495e; margin-bottom: 30px;'>Sua plataforma de elite para Análise Exploratória de Dados</h3>", unsafe_allow_html=True)